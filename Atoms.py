@@ -1,5 +1,9 @@
 """Infrastructure for storing periodic table data for Slater shielding code.
 """
+from collections import OrderedDict
+import numpy
+import Instrumentation
+
 principalLabels = [1, 2, 3, 3, 4, 4, 4, 5, 5, 5, 5, 6, 6, 6, 6, 6, 7, 7, 7, 7, 7, 7, 8, 8, 8, 8, 8, 8, 8, 9, 9, 9, 9, 9,
                    9, 9, 9, 9, 10, 10, 10, 10, 10, 10, 10, 11, 11, 11, 11, 11, 11, 12, 12, 12, 12, 12, 13, 13, 13, 13,
                    14, 14, 14, 15, 15, 16]  # This is principal quantum number N. combine with azimuthal labels to get "1s" "2sp", "3sp", etc
@@ -9,56 +13,173 @@ azimuthalLabels = ["s", "sp", "sp", "d", "sp", "d", "f", "sp", "d", "f", "g", "s
                    "d", "f", "g", "h", "i", "j", "sp", "d", "f", "g", "h", "i", "sp", "d", "f", "g", "h", "sp", "d",
                    "f", "g", "sp", "d", "f", "sp", "d", "sp"]  # This is the azimuthal quantum number, combined into Slater groups.
 
+shellSlots = len(azimuthalLabels)  # number of shells an occupancy list can describe
+
+
+def buildShieldingRules():
+    """Writes the Slater shielding rules as shielding = occupancy @ matrix.T + bias over all shell slots. Row i of the
+    matrix holds how much one electron in each shell shields shell i: 0.3 within 1s, 0.35 within any other shell,
+    0.85 from the shell below an sp shell and 1 from every other lower shell. The bias removes the electron's own
+    contribution from the same-shell term."""
+    matrix = numpy.zeros((shellSlots, shellSlots))
+    bias = numpy.full(shellSlots, -0.35)
+    matrix[0, 0] = 0.3
+    bias[0] = -0.3
+    for i in range(1, shellSlots):
+        for j in range(i):
+            if azimuthalLabels[i] == 'sp' and principalLabels[j] == principalLabels[i] - 1:
+                matrix[i, j] = 0.85
+            else:
+                matrix[i, j] = 1.0
+        matrix[i, i] = 0.35
+    return matrix, bias
+
+
+shieldingMatrix, shieldingBias = buildShieldingRules()
+
+# The labels as arrays, so that each NewAtom can hold a view of them instead of its own lists
+principalArray = numpy.array(principalLabels[:shellSlots])
+principalArray.setflags(write=False)
+azimuthalArray = numpy.array(azimuthalLabels)
+azimuthalArray.setflags(write=False)
+occupancyType = numpy.int8  # the largest shell holds 34 electrons
+
+
+def occupancyArray(occupancy):
+    """Converts an occupancy list to the array NewAtom keeps, checking that it fits the shell slots. Whole electron
+    counts are kept in the compact occupancyType; fractional occupancies (averaged configurations) stay float64."""
+    values = numpy.asarray(occupancy)
+    if values.ndim != 1 or len(values) > shellSlots:
+        raise ValueError("occupancy must list at most " + str(shellSlots) + " electron counts, got " + repr(occupancy))
+    return occupancyMatrix(values)
+
+
+def occupancyMatrix(occupancies):
+    """A copy of an occupancy list or of a (configurations, shells) occupancy matrix, of occupancyType unless it holds
+    fractional occupancies."""
+    values = numpy.array(occupancies)
+    compact = values.astype(occupancyType)
+    if values.dtype == occupancyType or (compact == values).all():
+        return compact
+    return values.astype(float)
+
+
+def padOccupancies(occupancies):
+    """Stacks occupancy lists of any length into a zero padded (configurations, shellSlots) array, of occupancyType
+    unless some occupancy is fractional."""
+    rows = [occupancyArray(occupancy) for occupancy in occupancies]
+    padded = numpy.zeros((len(rows), shellSlots), dtype=numpy.result_type(occupancyType, *rows))
+    for i, row in enumerate(rows):
+        padded[i, :len(row)] = row
+    return padded
+
+
+def shieldingConstants(occupancy):
+    """Slater shielding constants of one configuration or of many at once, as a single matrix product. \n
+    occupancy -- list or array of shell occupancies, or a (configurations, shells) array with one padded
+    configuration per row \n
+    Returns: an array of the same shape holding the shielding of each shell"""
+    occupancy = numpy.asarray(occupancy, dtype=float)
+    shells = occupancy.shape[-1]
+    shielding = occupancy @ shieldingMatrix[:shells, :shells].T
+    shielding += shieldingBias[:shells]
+    return shielding
+
+
+def totalEnergies(atomicNumber, occupancy, shielding=None):
+    """Total Slater energies in Hartrees, the sum of -N ((Z - s) / N)^2 over occupied shells, for one configuration or
+    for many at once. \n
+    atomicNumber -- nuclear charge Z, or an array with one per configuration \n
+    occupancy -- occupancy list or (configurations, shells) array as for shieldingConstants \n
+    shielding -- the shielding constants, when already known"""
+    hartree = 1
+    occupancy = numpy.asarray(occupancy, dtype=float)
+    if shielding is None:
+        charge = shieldingConstants(occupancy)
+    else:
+        charge = numpy.array(shielding, dtype=float)
+    # N ((Z - s) / N)^2 = (Z - s)^2 / N, summed over the occupied shells; worked in place to spare large batches
+    # extra temporary arrays
+    numpy.subtract(numpy.asarray(atomicNumber, dtype=float)[..., None], charge, out=charge)
+    charge *= charge
+    occupied = occupancy != 0
+    numpy.divide(charge, occupancy, out=charge, where=occupied)
+    return numpy.sum(charge, axis=-1, where=occupied) * (-1 * hartree)
+
 
 class NewAtom:
-    """A new atom object to better suit my needs."""
+    """A new atom object to better suit my needs.
+    Kept small because millions of configurations may be enumerated: the occupancy is a numpy array (see
+    occupancyArray) of occupancyType when every count is whole and float64 when some are fractional, the label lists
+    are views of the shared principalArray and azimuthalArray, and __slots__ leaves out the per-object attribute
+    dictionary."""
+    __slots__ = ("atomicNumber", "name", "occupancy", "principalQuantumNumberLabelList",
+                 "azimuthalQuantumNumberLabelList", "shieldingValues", "totalEnergy", "model")
+
     def __init__(self, atomicNumber, name, occupancy):
+        Instrumentation.count("calls: Atoms.NewAtom")
         self.atomicNumber = atomicNumber
         self.name = name
-        self.occupancy = occupancy
-        self.principalQuantumNumberLabelList = []
-        self.azimuthalQuantumNumberLabelList = []  # This is the azimuthal quantum number of an electron, ie 'sp' 'd' 'f' etc
-        self.shieldingValues = []
+        self.occupancy = occupancyArray(occupancy)
+        self.principalQuantumNumberLabelList = principalArray[:len(self.occupancy)]
+        self.azimuthalQuantumNumberLabelList = azimuthalArray[:len(self.occupancy)]  # This is the azimuthal quantum number of an electron, ie 'sp' 'd' 'f' etc
+        self.shieldingValues = None
         self.totalEnergy = -1
-        for i in range(len(self.occupancy)):
-            self.principalQuantumNumberLabelList.append(principalLabels[i])
-            self.azimuthalQuantumNumberLabelList.append(azimuthalLabels[i])
+        self.model = None  # compiled Slater.AtomModel, built on demand by compile()
         self.computeShieldingConstants()
         self.computeTotalEnergy()
 
     def computeTotalEnergy(self):
         """Computes the total energy of the atom and adds it as an object variable to the atom object."""
-        hartree = 1
-        totalEnergy = 0
-        for i in range(len(self.occupancy)):
-            if not self.occupancy[i] == 0:
-                # print("i = " + str(i) + ": " + str((atom.occupancy[i] * ((atom.atomicNumber - atom.shieldingValues[i]) / atom.occupancy[i]) * (-1 * hartree))))  # prints the energy contribution of each orbital
-                totalEnergy = totalEnergy + (self.occupancy[i] * (((self.atomicNumber - self.shieldingValues[i]) / self.occupancy[i]) ** 2) * (-1 * hartree))
-        self.totalEnergy = totalEnergy
+        with Instrumentation.span("Atoms.energy"):
+            self.totalEnergy = float(totalEnergies(self.atomicNumber, self.occupancy, self.shieldingValues))
 
     def computeShieldingConstants(self):
         """Computes the shielding constants of the atom using the Slater shielding rules and adds it to the object in
-        the form of a list, with each element of the list representing the shielding of a given shell."""
-        lists = []
-        for i in range(0, len(self.occupancy)):
-            shielding = 0
-            if i == 0:  # this is the 1s shell.
-                shielding = shielding + 0.3 * (self.occupancy[i] - 1)
-            else:
-                for j in range(0, i + 1):
-                    if j == i:
-                        shielding = shielding + 0.35 * (self.occupancy[j] - 1)
-                    elif self.azimuthalQuantumNumberLabelList[i] == 'sp' and self.principalQuantumNumberLabelList[j] == self.principalQuantumNumberLabelList[i] - 1:
-                        shielding = shielding + 0.85 * (self.occupancy[j])
-                    else:
-                        shielding = shielding + (self.occupancy[j])
-            lists.append(shielding)
-        self.shieldingValues = lists
+        the form of an array, with each element of the array representing the shielding of a given shell."""
+        with Instrumentation.span("Atoms.shielding"):
+            self.shieldingValues = shieldingConstants(self.occupancy)
+        self.model = None
+
+    def compile(self):
+        """Returns the Slater.AtomModel holding this atom's per-shell coefficients, building it on the first call.
+        Call computeShieldingConstants() again after changing the occupancy so the model is rebuilt."""
+        if self.model is None:
+            import Slater  # Slater imports this module, so it cannot be imported at the top of the file.
+            self.model = Slater.AtomModel.fromAtom(self)
+        return self.model
 
     def __repr__(self):
         return "This is a newAtom object! It contains the following human readable data:\n\nAtomic Number: " + str(self.atomicNumber) + "\nAbbreviation: " + str(self.name) + "\nElectron Occupancy: " + str(self.occupancy) + "\nTotal Energy: " + str(self.totalEnergy) + " Hartrees\n\nIt also contains lists with labels for both its principal and azimuthal quantum numbers\nand a list containing the shielding constants of each orbital.\n"
 
 
+class FrozenAtom(NewAtom):
+    """A NewAtom shared between callers by AtomFactory. Its arrays are read-only and its attributes cannot be
+    reassigned, so one caller cannot change the atom under another. Build these with AtomFactory, not directly."""
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError("interned atoms are shared and cannot be changed; build a NewAtom to modify")
+
+    def __reduce__(self):
+        # Pickled atoms are interned again in the process that loads them.
+        return internAtom, (self.atomicNumber, self.occupancy.tolist(), self.name)
+
+
+def freezeAtom(atom):
+    """Turns a freshly built NewAtom into a FrozenAtom in place, compiling its Slater model first so that nothing
+    needs to be written to it later. The arrays of the model are made read-only too, since every holder of the atom
+    shares it."""
+    model = atom.compile()
+    for value in vars(model).values():
+        if isinstance(value, numpy.ndarray):
+            value.setflags(write=False)
+    atom.occupancy.setflags(write=False)
+    atom.shieldingValues.setflags(write=False)
+    atom.__class__ = FrozenAtom
+    return atom
+
+
 '''class Atom:
     """quick and dirty class for structured atomic data.
     Use with Periodic Table to get a dictionary of elements
@@ -253,6 +374,122 @@ atomData = {
             'Ts': {"atomicNumber": 117, "name": "Ts", "occupancy": [2, 8, 8, 10, 8, 10, 14, 8, 10, 14, 0, 8, 10, 0, 0, 0, 7]},
             'Og': {"atomicNumber": 118, "name": "Og", "occupancy": [2, 8, 8, 10, 8, 10, 14, 8, 10, 14, 0, 8, 10, 0, 0, 0, 8]}
 }
+
+
+class PeriodicTable:
+    """The neutral atoms of atomData as a few contiguous arrays instead of a dictionary of dictionaries: one entry per
+    element in atomicNumbers, names and shellCounts (the length of its occupancy list) and one zero padded row per
+    element in the (elements, shellSlots) occupancies matrix."""
+    __slots__ = ("atomicNumbers", "names", "shellCounts", "occupancies", "rows")
+
+    def __init__(self, atomicNumbers, names, shellCounts, occupancies):
+        self.atomicNumbers = numpy.ascontiguousarray(atomicNumbers, dtype=numpy.int16)
+        self.names = list(names)
+        self.shellCounts = numpy.ascontiguousarray(shellCounts, dtype=numpy.int8)
+        self.occupancies = occupancyMatrix(occupancies)
+        self.rows = {name: i for i, name in enumerate(self.names)}
+
+    @classmethod
+    def fromAtomData(cls, data):
+        """Packs a dictionary laid out like atomData."""
+        occupancies = padOccupancies([entry["occupancy"] for entry in data.values()])
+        shellCounts = [len(entry["occupancy"]) for entry in data.values()]
+        return cls([entry["atomicNumber"] for entry in data.values()], list(data), shellCounts, occupancies)
+
+    def __len__(self):
+        return len(self.names)
+
+    def index(self, name):
+        """Row of the element called name, e.g. "Fe"."""
+        return self.rows[name]
+
+    def occupancy(self, row):
+        """Occupancy array of one element, trimmed to its own length, given its row or name."""
+        if isinstance(row, str):
+            row = self.rows[row]
+        return self.occupancies[row, :self.shellCounts[row]]
+
+    def atom(self, row):
+        """Builds the NewAtom for one element, given its row or name."""
+        if isinstance(row, str):
+            row = self.rows[row]
+        return NewAtom(int(self.atomicNumbers[row]), self.names[row], self.occupancy(row))
+
+    def shielding(self):
+        """Shielding constants of every element at once, as an (elements, shellSlots) array."""
+        return shieldingConstants(self.occupancies)
+
+    def energies(self):
+        """Total Slater energies of every element at once."""
+        return totalEnergies(self.atomicNumbers, self.occupancies)
+
+
+periodicTable = PeriodicTable.fromAtomData(atomData)
+
+
+class AtomFactory:
+    """Interns atoms by (atomicNumber, occupancy) so that each configuration is built once and then shared as a
+    FrozenAtom. Configurations are held in a least-recently-used store of at most maxSize atoms. The elements of
+    periodicTable, once requested with element(), are kept for good and found with a single dictionary lookup."""
+
+    def __init__(self, maxSize=4096):
+        self.maxSize = maxSize
+        self.atoms = OrderedDict()  # (atomicNumber, occupancy tuple) -> FrozenAtom, most recently used last
+        self.elements = {}  # element name -> FrozenAtom
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, atomicNumber, occupancy, name=None):
+        """Returns the shared atom for a configuration, building it on first use. The name given the first time is
+        the one kept; it defaults to "Z = <atomicNumber>"."""
+        key = (int(atomicNumber), tuple(float(n) for n in occupancy))
+        atom = self.atoms.get(key)
+        if atom is not None:
+            self.atoms.move_to_end(key)
+            self.hits += 1
+            return atom
+        self.misses += 1
+        atom = freezeAtom(NewAtom(key[0], name if name is not None else "Z = " + str(key[0]), occupancy))
+        self.atoms[key] = atom
+        if len(self.atoms) > self.maxSize:
+            self.atoms.popitem(last=False)
+        return atom
+
+    def element(self, name):
+        """Returns the shared neutral atom of the element called name, e.g. "Fe"."""
+        atom = self.elements.get(name)
+        if atom is not None:
+            self.hits += 1
+            return atom
+        row = periodicTable.index(name)
+        atom = self.get(periodicTable.atomicNumbers[row], periodicTable.occupancy(row), name)
+        self.elements[name] = atom
+        return atom
+
+    def clear(self):
+        """Forgets every interned atom and resets the statistics."""
+        self.atoms.clear()
+        self.elements.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.atoms)
+
+    def __repr__(self):
+        return ("AtomFactory: " + str(len(self.atoms)) + " of " + str(self.maxSize) + " configurations, "
+                + str(len(self.elements)) + " elements, " + str(self.hits) + " hits, " + str(self.misses) + " misses")
+
+
+# Factory shared by everything in this process that does not make its own
+defaultFactory = AtomFactory()
+
+
+def internAtom(atomicNumber, occupancy, name=None):
+    """The shared atom for a configuration from defaultFactory (see AtomFactory.get)."""
+    return defaultFactory.get(atomicNumber, occupancy, name)
+
+
 # work in progress refactoring of the atoms database that doesnt require creating an atom object for every atom in the database at runtime.
 
 
@@ -468,3 +705,248 @@ def Normal(atom):  # This literally does nothing? (Daniel 2-6-2022)
 
 """def setAtomConfig(atom, atomconfig):
     return configTable[atomconfig](atom)"""
+
+
+# Configuration variants. The transforms above work on one atom at a time and need hand typed ion tables; the
+# functions below derive ions, excitations and valence or core variants from any stack of occupancies at once.
+# Each works on a (configurations, shellSlots) array of zero padded occupancies, one configuration per row.
+variantKinds = ("neutral", "cation", "anion", "single", "double", "valence", "core")
+maxOccupancyArray = numpy.array(maxoccupancy, dtype=numpy.int16)
+maxOccupancyArray.setflags(write=False)
+
+
+def outermostShells(occupancies):
+    """Slot of the last occupied shell of each row, or -1 for a row with no electrons."""
+    occupied = numpy.asarray(occupancies) != 0
+    last = occupied.shape[1] - 1 - numpy.argmax(occupied[:, ::-1], axis=1)
+    last[~occupied.any(axis=1)] = -1
+    return last
+
+
+def removeElectron(occupancies):
+    """Takes one electron out of the outermost occupied shell of each row, as the cations in the old
+    periodictable_ions do. \n
+    Returns: the new occupancies and a mask of the rows that had a whole electron to lose."""
+    occupancies = occupancyMatrix(occupancies)
+    last = outermostShells(occupancies)
+    valid = (last >= 0) & (occupancies[numpy.arange(len(occupancies)), last] >= 1)
+    rows = numpy.flatnonzero(valid)
+    occupancies[rows, last[rows]] -= 1
+    return occupancies, valid
+
+
+def addElectron(occupancies):
+    """Adds one electron to the outermost occupied shell of each row, or to the next slot when that shell is full,
+    as the anions in the old periodictable_ions do. \n
+    Returns: the new occupancies and a mask of the rows that had room for it."""
+    occupancies = occupancyMatrix(occupancies)
+    last = numpy.maximum(outermostShells(occupancies), 0)
+    rows = numpy.arange(len(occupancies))
+    target = numpy.where(occupancies[rows, last] <= maxOccupancyArray[last] - 1, last, last + 1)
+    valid = target < shellSlots
+    rows = rows[valid]
+    occupancies[rows, target[valid]] += 1
+    return occupancies, valid
+
+
+def excitations(occupancies, extraShells=1, limit=None):
+    """Every configuration reached by moving one electron from a shell holding at least one to a higher shell with room
+    for it. \n
+    occupancies -- (configurations, shellSlots) array \n
+    extraShells -- how many slots beyond the outermost occupied shell an electron may be moved to \n
+    limit -- highest slot each row may move an electron to, overriding extraShells \n
+    Returns: the excited occupancies, the row of occupancies each came from, and the source and target slots"""
+    occupancies = occupancyMatrix(occupancies)
+    if limit is None:
+        limit = outermostShells(occupancies) + extraShells
+    limit = numpy.minimum(limit, shellSlots - 1)
+    highest = int(limit.max(initial=0))
+    source, target = numpy.triu_indices(highest + 1, k=1)
+    allowed = ((occupancies[:, source] >= 1) & (occupancies[:, target] <= maxOccupancyArray[target] - 1)
+               & (target <= limit[:, None]))
+    rows, pairs = numpy.nonzero(allowed)
+    excited = occupancies[rows]
+    moved = numpy.arange(len(rows))
+    excited[moved, source[pairs]] -= 1
+    excited[moved, target[pairs]] += 1
+    return excited, rows, source[pairs], target[pairs]
+
+
+def doubleExcitations(occupancies, extraShells=1):
+    """Every configuration reached by two single excitations (see excitations) that is not the configuration itself
+    or one of its single excitations. Moves stay within extraShells of the original outermost shell. \n
+    Returns: the excited occupancies and the row of occupancies each came from"""
+    occupancies = occupancyMatrix(occupancies)
+    limit = outermostShells(occupancies) + extraShells
+    singles, singleRows = excitations(occupancies, limit=limit)[:2]
+    doubles, doubleRows = excitations(singles, limit=limit[singleRows])[:2]
+    doubleRows = singleRows[doubleRows]
+    # Keep the first copy of each double that is neither the parent nor a single excitation of the same parent.
+    rows = numpy.concatenate([numpy.arange(len(occupancies)), singleRows, doubleRows])
+    keys = numpy.column_stack([rows, numpy.concatenate([occupancies, singles, doubles])])
+    unique, first = numpy.unique(keys, axis=0, return_index=True)
+    keep = numpy.sort(first[first >= len(occupancies) + len(singles)]) - len(occupancies) - len(singles)
+    return doubles[keep], doubleRows[keep]
+
+
+def valenceShells(occupancies):
+    """Keeps only the outermost occupied shell of each row, like the old Valence transform."""
+    occupancies = occupancyMatrix(occupancies)
+    last = outermostShells(occupancies)
+    valence = numpy.zeros_like(occupancies)
+    rows = numpy.flatnonzero(last >= 0)
+    valence[rows, last[rows]] = occupancies[rows, last[rows]]
+    return valence
+
+
+def coreShells(occupancies):
+    """Empties the outermost occupied shell of each row, leaving the core beneath it."""
+    occupancies = occupancyMatrix(occupancies)
+    last = outermostShells(occupancies)
+    rows = numpy.flatnonzero(last >= 0)
+    occupancies[rows, last[rows]] = 0
+    return occupancies
+
+
+def shellMoves(change):
+    """Labels of the shells that gained electrons in change, one per whole electron, with any fraction written
+    after the label, e.g. ["2sp", "2sp", "3d(0.5)"]."""
+    moves = []
+    for j in numpy.flatnonzero(change > 0):
+        whole, fraction = divmod(float(change[j]), 1.0)
+        moves += [occupancylabels[j]] * int(whole)
+        if fraction:
+            moves.append(occupancylabels[j] + "(" + format(fraction, "g") + ")")
+    return moves
+
+
+class ConfigurationSet:
+    """A stack of configurations derived from a list of parent atoms, kept as arrays so that shielding, energies and
+    densities of the whole set are each computed in one batch: atomicNumbers, the (configurations, shellSlots)
+    occupancies, the parent row of each configuration and its kind as an index into variantKinds."""
+    __slots__ = ("atomicNumbers", "occupancies", "parents", "kinds", "parentNames", "parentOccupancies")
+
+    def __init__(self, atomicNumbers, occupancies, parents, kinds, parentNames, parentOccupancies):
+        self.atomicNumbers = numpy.ascontiguousarray(atomicNumbers, dtype=numpy.int16)
+        self.occupancies = occupancyMatrix(occupancies)
+        self.parents = numpy.ascontiguousarray(parents, dtype=numpy.int32)
+        self.kinds = numpy.ascontiguousarray(kinds, dtype=numpy.int8)
+        self.parentNames = list(parentNames)
+        self.parentOccupancies = occupancyMatrix(parentOccupancies)
+
+    def __len__(self):
+        return len(self.atomicNumbers)
+
+    def __repr__(self):
+        counts = numpy.bincount(self.kinds, minlength=len(variantKinds))
+        return ("ConfigurationSet of " + str(len(self)) + " configurations from " + str(len(self.parentNames))
+                + " atoms (" + ", ".join(str(c) + " " + k for k, c in zip(variantKinds, counts) if c) + ")")
+
+    def charges(self):
+        """Net charge of each configuration, positive for cations."""
+        return self.atomicNumbers - self.occupancies.sum(axis=1, dtype=numpy.result_type(numpy.int16, self.occupancies))
+
+    def select(self, kind):
+        """The configurations of one kind from variantKinds, e.g. "cation", as a new ConfigurationSet."""
+        rows = numpy.flatnonzero(self.kinds == variantKinds.index(kind))
+        return ConfigurationSet(self.atomicNumbers[rows], self.occupancies[rows], self.parents[rows], self.kinds[rows],
+                                self.parentNames, self.parentOccupancies)
+
+    def label(self, i):
+        """Human readable description of configuration i, e.g. "Fe +2" or "Ne single 2sp->3sp"."""
+        name = self.parentNames[self.parents[i]]
+        kind = variantKinds[self.kinds[i]]
+        if kind == "neutral":
+            return name
+        if kind in ("cation", "anion"):
+            return name + " " + format(float(self.charges()[i]), "+g")
+        if kind in ("single", "double"):
+            change = self.occupancies[i].astype(float) - self.parentOccupancies[self.parents[i]]
+            moves = ",".join(shellMoves(-change)) + "->" + ",".join(shellMoves(change))
+            return name + " " + kind + " " + moves
+        return name + " " + kind
+
+    def occupancy(self, i):
+        """Occupancy array of configuration i, trimmed after its outermost occupied shell."""
+        last = outermostShells(self.occupancies[i:i + 1])[0]
+        return self.occupancies[i, :max(last + 1, 1)]
+
+    def atom(self, i):
+        """The shared NewAtom of configuration i from defaultFactory, named by label(i)."""
+        return defaultFactory.get(self.atomicNumbers[i], self.occupancy(i), self.label(i))
+
+    def shielding(self):
+        """Shielding constants of every configuration, as a (configurations, shellSlots) array."""
+        return shieldingConstants(self.occupancies)
+
+    def energies(self):
+        """Total Slater energies of every configuration."""
+        return totalEnergies(self.atomicNumbers, self.occupancies)
+
+    def model(self):
+        """Every occupied shell of every configuration in one Slater.AtomModel, with atomIndex giving the row."""
+        import Slater
+        return Slater.AtomModel.fromConfigurations(self.atomicNumbers, self.occupancies)
+
+    def densities(self, arrayX, orders=(0, 1, 2, 3, 4), out=None, workspace=None, threads=1):
+        """Total densities of every configuration in one batch; see Slater.batchDensity for the arguments and the
+        (configurations, len(orders), len(arrayX)) result."""
+        import Slater
+        return Slater.tableDensity(arrayX, self.model(), len(self), orders, out=out, workspace=workspace, threads=threads)
+
+
+def configurationVariants(names=None, kinds=variantKinds, maxCharge=None, maxAnionCharge=1, extraShells=1):
+    """Derives ions, excitations and valence or core variants from elements of periodicTable, all at once. \n
+    names -- element names, e.g. periodicTable.names[:54] for everything up to Xe; defaults to every element \n
+    kinds -- which of variantKinds to generate \n
+    maxCharge -- highest cation charge; by default every cation that still has an electron \n
+    maxAnionCharge -- highest anion charge \n
+    extraShells -- how far above the outermost occupied shell excitations may reach (see excitations) \n
+    Returns: a ConfigurationSet"""
+    if names is None:
+        names = periodicTable.names
+    for kind in kinds:
+        if kind not in variantKinds:
+            raise ValueError("unknown configuration kind " + repr(kind) + ", expected one of " + str(variantKinds))
+    rows = numpy.array([periodicTable.index(name) for name in names], dtype=int)
+    atomicNumbers = periodicTable.atomicNumbers[rows]
+    parents = periodicTable.occupancies[rows]
+    parentRows = numpy.arange(len(rows))
+    pieces = []  # (parent rows, occupancies, kind) for each block of variants
+
+    if "neutral" in kinds:
+        pieces.append((parentRows, parents, "neutral"))
+    if "cation" in kinds:
+        current, currentRows = parents, parentRows
+        for charge in range(1, (int(atomicNumbers.max(initial=0)) if maxCharge is None else maxCharge) + 1):
+            current, valid = removeElectron(current)
+            valid &= current.any(axis=1)
+            current, currentRows = current[valid], currentRows[valid]
+            if len(current) == 0:
+                break
+            pieces.append((currentRows, current, "cation"))
+    if "anion" in kinds:
+        current, currentRows = parents, parentRows
+        for charge in range(1, maxAnionCharge + 1):
+            current, valid = addElectron(current)
+            current, currentRows = current[valid], currentRows[valid]
+            pieces.append((currentRows, current, "anion"))
+    if "single" in kinds:
+        excited, excitedRows = excitations(parents, extraShells)[:2]
+        pieces.append((excitedRows, excited, "single"))
+    if "double" in kinds:
+        excited, excitedRows = doubleExcitations(parents, extraShells)
+        pieces.append((excitedRows, excited, "double"))
+    if "valence" in kinds:
+        pieces.append((parentRows, valenceShells(parents), "valence"))
+    if "core" in kinds:
+        core = coreShells(parents)
+        hasCore = core.any(axis=1)
+        pieces.append((parentRows[hasCore], core[hasCore], "core"))
+
+    configurationParents = numpy.concatenate([piece[0] for piece in pieces] + [numpy.zeros(0, dtype=int)])
+    occupancies = numpy.concatenate([piece[1] for piece in pieces] + [numpy.zeros((0, shellSlots), dtype=occupancyType)])
+    configurationKinds = numpy.concatenate([numpy.full(len(piece[0]), variantKinds.index(piece[2])) for piece in pieces]
+                                           + [numpy.zeros(0, dtype=int)])
+    return ConfigurationSet(atomicNumbers[configurationParents], occupancies, configurationParents, configurationKinds,
+                            list(names), parents)
@@ -0,0 +1,178 @@
+"""Benchmark suite for the Slater density engine.
+
+Times Slater.newDensity and Slater.grlaglll over a sweep of atoms, grid sizes and derivative orders, together with
+Atoms.NewAtom construction, the gamma functions and grid building, and reports throughput. Density throughput is
+counted in grid points times occupied shells per second, so atoms of different size can be compared. Grids of
+streamSize points or more are never built in full: they are timed through Slater.streamDensity and per-block grlaglll
+calls in blocks of streamChunk points, which keeps the memory of the default sweep bounded whatever the atom.
+
+Results can be saved as a JSON baseline tagged with the machine they ran on, and later runs compared against it:
+
+    python Benchmark.py --save                       # write benchmarks/<machine tag>.json
+    python Benchmark.py --compare                    # exit with status 1 if anything is slower than the threshold
+    python Benchmark.py --sizes 1000 1000000 --atoms Fe Og --orders 0 0,1,2,3,4
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import numpy
+import Atoms
+import Gamma
+import GridStretch
+import Slater
+
+defaultAtoms = ["H", "Ne", "Fe", "Xe", "Og"]
+defaultSizes = [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6, 10 ** 7]
+defaultOrders = [(0,), (0, 1, 2, 3, 4)]
+streamSize = 10 ** 6
+streamChunk = 65536
+baselineDirectory = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmarks")
+
+
+def machineTag():
+    """Identifies the machine and software a baseline was recorded on."""
+    return "-".join([platform.node() or "unknown", platform.machine() or "unknown", "py" + platform.python_version(),
+                     "numpy" + numpy.__version__]).replace(os.sep, "_")
+
+
+def timeCall(function, minimumTime=0.2, repeat=3):
+    """Best time in seconds of one call of function, looping each measurement until it lasts at least minimumTime."""
+    loops = 1
+    while True:
+        startTime = time.perf_counter()
+        for _ in range(loops):
+            function()
+        elapsed = time.perf_counter() - startTime
+        if elapsed >= minimumTime or loops >= 10 ** 6:
+            break
+        loops *= 10 if elapsed < minimumTime / 10 else 2
+    best = elapsed / loops
+    for _ in range(repeat - 1):
+        startTime = time.perf_counter()
+        for _ in range(loops):
+            function()
+        best = min(best, (time.perf_counter() - startTime) / loops)
+    return best
+
+
+def streamedGrlaglll(grid, atom, chunkSize, workspace):
+    """Evaluates grlaglll over a gridChunks description one block at a time, reusing the workspace."""
+    for chunkX in GridStretch.gridChunks(chunkSize=chunkSize, **grid):
+        Slater.grlaglll(chunkX, atom, workspace=workspace)
+
+
+def runBenchmarks(atomNames=defaultAtoms, sizes=defaultSizes, ordersList=defaultOrders, minimumTime=0.2, report=print,
+                  streamFrom=streamSize, chunkSize=streamChunk):
+    """Runs the suite and returns a dictionary of results keyed by benchmark name. Each result holds the time per call
+    in seconds and, where it makes sense, a throughput. Density timings for sizes of at least streamFrom points go
+    through streamDensity in blocks of chunkSize points and are named streamDensity/... and grlaglll/stream/..."""
+    results = {}
+
+    def record(name, seconds, work=None, unit=None):
+        results[name] = {"seconds": seconds}
+        line = name + ": " + format(seconds * 1e3, ".4g") + " ms"
+        if work is not None:
+            results[name]["throughput"] = work / seconds
+            results[name]["unit"] = unit
+            line += ", " + format(work / seconds, ".4g") + " " + unit
+        report(line)
+
+    for name in atomNames:
+        data = Atoms.atomData[name]
+        record("NewAtom/" + name, timeCall(lambda: Atoms.NewAtom(data["atomicNumber"], name, data["occupancy"]), minimumTime))
+    record("Gamma.gamma/scalar", timeCall(lambda: Gamma.gamma(3.7), minimumTime))
+    gammaArguments = numpy.linspace(0.5, 20.0, 10 ** 4)
+    record("Gamma.realGamma/10000", timeCall(lambda: Gamma.realGamma(gammaArguments), minimumTime), 10 ** 4, "values/s")
+
+    for size in sizes:
+        arrayX = numpy.linspace(0.01, 20.0, size)
+        record("ExpGridStretch2/" + str(size), timeCall(lambda: GridStretch.ExpGridStretch2(arrayX), minimumTime), size, "points/s")
+        record("GridContext/" + str(size), timeCall(lambda: GridStretch.GridContext(arrayX), minimumTime), size, "points/s")
+        streamed = size >= streamFrom
+        if streamed:
+            del arrayX
+            grid = {"start": 0.01, "stop": 20.0, "count": size}
+        else:
+            grid = GridStretch.GridContext(arrayX)
+        for name in atomNames:
+            atom = Slater.toAtom(name)
+            shells = len(atom.compile())
+            workspace = Slater.Workspace()
+            for orders in ordersList:
+                label = "/" + name + "/" + str(size) + "/orders" + "".join(str(k) for k in orders)
+                if streamed:
+                    seconds = timeCall(lambda: sum(1 for _ in Slater.streamDensity(grid, atom, orders, True, chunkSize,
+                                                                                   workspace)), minimumTime)
+                    record("streamDensity" + label, seconds, size * shells, "point-shells/s")
+                else:
+                    seconds = timeCall(lambda: Slater.newDensity(grid, atom, orders, workspace=workspace), minimumTime)
+                    record("newDensity" + label, seconds, size * shells, "point-shells/s")
+            if streamed:
+                record("grlaglll/stream/" + name + "/" + str(size),
+                       timeCall(lambda: streamedGrlaglll(grid, atom, chunkSize, workspace), minimumTime), size * shells, "point-shells/s")
+            else:
+                record("grlaglll/" + name + "/" + str(size), timeCall(lambda: Slater.grlaglll(grid, atom, workspace=workspace), minimumTime),
+                       size * shells, "point-shells/s")
+    return results
+
+
+def baselinePath(tag=None):
+    return os.path.join(baselineDirectory, (tag or machineTag()) + ".json")
+
+
+def saveBaseline(results, path):
+    """Writes results to a JSON baseline file along with the machine tag and date."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump({"machine": machineTag(), "date": time.strftime("%Y-%m-%d %H:%M:%S"), "results": results}, file, indent=1)
+
+
+def compareToBaseline(results, path, threshold=0.1, report=print):
+    """Compares results with a saved baseline and returns the names of benchmarks more than threshold (a fraction)
+    slower than it. Benchmarks missing from either side are skipped."""
+    with open(path, "r") as file:
+        baseline = json.load(file)["results"]
+    regressions = []
+    for name in results:
+        if name not in baseline:
+            continue
+        ratio = results[name]["seconds"] / baseline[name]["seconds"]
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            report("REGRESSION " + name + ": " + format(ratio, ".3f") + "x the baseline time")
+    report(str(len(regressions)) + " regression(s) beyond " + format(threshold * 100, "g") + "% against " + path)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Slater density engine.")
+    parser.add_argument("--atoms", nargs="+", default=defaultAtoms, help="element names from Atoms.atomData")
+    parser.add_argument("--sizes", nargs="+", type=int, default=defaultSizes, help="grid sizes")
+    parser.add_argument("--orders", nargs="+", default=[",".join(str(k) for k in orders) for orders in defaultOrders],
+                        help="comma separated derivative orders, one set per argument")
+    parser.add_argument("--time", type=float, default=0.2, help="minimum seconds per measurement")
+    parser.add_argument("--stream-from", type=int, default=streamSize, help="grid size from which densities are streamed in blocks")
+    parser.add_argument("--chunk", type=int, default=streamChunk, help="points per block when streaming")
+    parser.add_argument("--save", nargs="?", const="", default=None, help="save the results as a baseline (default path per machine)")
+    parser.add_argument("--compare", nargs="?", const="", default=None, help="compare against a baseline (default path per machine)")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown fraction that counts as a regression")
+    arguments = parser.parse_args(argv)
+
+    ordersList = [tuple(int(k) for k in orders.split(",")) for orders in arguments.orders]
+    results = runBenchmarks(arguments.atoms, arguments.sizes, ordersList, arguments.time,
+                            streamFrom=arguments.stream_from, chunkSize=arguments.chunk)
+    status = 0
+    if arguments.compare is not None:
+        if compareToBaseline(results, arguments.compare or baselinePath(), arguments.threshold):
+            status = 1
+    if arguments.save is not None:
+        saveBaseline(results, arguments.save or baselinePath())
+        print("Saved baseline to " + (arguments.save or baselinePath()))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""Search for the occupancies of lowest Slater energy.
+
+For a nuclear charge Z and a number of electrons, every way of filling a set of candidate shells within maxoccupancy
+is ranked by Atoms.totalEnergies. Shell i's energy, -(Z - s_i)^2 / N_i, depends only on the shells before it, and of
+those only through the number of electrons placed so far and, for an sp shell, the number in the shell group just
+below it. The search therefore fills the shells in order, one whole block of partial configurations at a time, and
+keeps only the best few partial configurations for each (electrons left, electrons in the current group) state.
+Partial configurations that cannot be completed, or whose best possible completion is worse than known complete
+configurations, are pruned. Configurations with an unbound shell (Z - s < 0) are never returned.
+
+The energy divides by the shell occupancy N_i, as Atoms.totalEnergies does, which rewards shells holding a single
+electron; pass slots to compare only the fillings of the shells in question.
+
+    import ConfigurationSearch
+    occupancies, energies = ConfigurationSearch.lowestConfigurations(26, count=5)
+    print(ConfigurationSearch.rankingTable(26, occupancies, energies))
+"""
+import numpy
+import Atoms
+
+# Shells beyond this principal quantum number have no effective quantum number n* in Slater.nStar, so their
+# densities cannot be evaluated.
+highestPrincipal = 7
+
+
+def referenceOccupancy(atomicNumber, electrons):
+    """The atomData occupancy of element atomicNumber when electrons matches it, otherwise the shells filled in slot
+    order, as a starting point for choosing candidate shells."""
+    for row in range(len(Atoms.periodicTable)):
+        if Atoms.periodicTable.atomicNumbers[row] == atomicNumber and Atoms.periodicTable.occupancy(row).sum() == electrons:
+            return numpy.array(Atoms.periodicTable.occupancy(row))
+    return aufbauOccupancy(electrons, numpy.arange(Atoms.shellSlots))
+
+
+def aufbauOccupancy(electrons, slots):
+    """Fills the given slots in order, each up to maxoccupancy, until the electrons run out."""
+    occupancy = numpy.zeros(Atoms.shellSlots, dtype=Atoms.occupancyType)
+    for slot in slots:
+        occupancy[slot] = min(electrons, Atoms.maxoccupancy[slot])
+        electrons -= occupancy[slot]
+    if electrons > 0:
+        raise ValueError("the shells cannot hold this many electrons")
+    last = Atoms.outermostShells(occupancy[None])[0]
+    return occupancy[:max(last + 1, 1)]
+
+
+def candidateSlots(atomicNumber, electrons, extraShells=1):
+    """The shells the search may fill by default: every slot up to extraShells beyond the outermost shell of
+    referenceOccupancy, leaving out shells above highestPrincipal."""
+    last = len(referenceOccupancy(atomicNumber, electrons)) - 1 + extraShells
+    slots = numpy.arange(min(last, Atoms.shellSlots - 1) + 1)
+    return slots[Atoms.principalArray[slots] <= highestPrincipal]
+
+
+def shellEnergies(atomicNumber, shielding, occupancy):
+    """-(Z - s)^2 / N for each shell, zero where the shell is empty."""
+    charge = atomicNumber - shielding
+    return numpy.divide(-charge * charge, occupancy, out=numpy.zeros_like(charge), where=occupancy != 0)
+
+
+def remainingBound(atomicNumber, electrons):
+    """Table of lower bounds on the energy still to come. Entry [p, k] bounds k more occupied shells placed after p
+    electrons: each shell's (Z - s)^2 / N is at most (Z - 0.85 p')^2, where p' >= p + (shells before it), since every
+    lower electron shields at least 0.85 and a bound shell has Z - s >= 0."""
+    perShell = numpy.maximum(atomicNumber - 0.85 * numpy.arange(2 * electrons + 2), 0.0) ** 2
+    cumulative = numpy.concatenate([[0.0], numpy.cumsum(perShell)])
+    p = numpy.arange(electrons + 1)[:, None]
+    k = numpy.arange(electrons + 1)[None, :]
+    return -(cumulative[p + k] - cumulative[p])
+
+
+def lowestConfigurations(atomicNumber, electrons=None, count=10, slots=None, extraShells=1):
+    """Ranks the occupancies of lowest total Slater energy. \n
+    atomicNumber -- nuclear charge Z \n
+    electrons -- number of electrons; defaults to the neutral atom, Z \n
+    count -- how many of the best configurations to return \n
+    slots -- shell slots that may be occupied (positions in Atoms.occupancylabels); defaults to candidateSlots \n
+    extraShells -- passed to candidateSlots when slots is not given \n
+    Returns: a (count, shells) array of occupancies, best first, and their energies in Hartrees"""
+    if electrons is None:
+        electrons = atomicNumber
+    if slots is None:
+        slots = candidateSlots(atomicNumber, electrons, extraShells)
+    slots = numpy.unique(numpy.asarray(slots, dtype=int))
+    width = int(slots.max(initial=0)) + 1
+    capacity = numpy.zeros(width, dtype=int)
+    capacity[slots] = Atoms.maxOccupancyArray[slots]
+    capacityAfter = numpy.concatenate([numpy.cumsum(capacity[::-1])[::-1][1:], [0]])  # room in the slots after each slot
+    shellsAfter = numpy.concatenate([numpy.cumsum((capacity > 0)[::-1])[::-1][1:], [0]])
+    if capacity.sum() < electrons:
+        raise ValueError("the candidate shells hold only " + str(capacity.sum()) + " electrons, not " + str(electrons))
+    bound = remainingBound(atomicNumber, electrons)
+    threshold = incumbentThreshold(atomicNumber, electrons, slots, count)
+
+    # The frontier: one row per partial configuration, with its electrons placed so far, the electrons in the
+    # current principal group, the electrons in the group below it and the energy of the shells filled so far.
+    occupancies = numpy.zeros((1, width), dtype=Atoms.occupancyType)
+    placed = numpy.zeros(1, dtype=int)
+    group = numpy.zeros(1, dtype=int)
+    energy = numpy.zeros(1)
+    for slot in range(width):
+        if slot > 0 and Atoms.principalArray[slot] != Atoms.principalArray[slot - 1]:
+            below = group
+            group = numpy.zeros_like(group)
+        else:
+            below = numpy.zeros_like(group) if slot == 0 else below
+        choices = numpy.arange(min(capacity[slot], electrons) + 1)
+        rows = numpy.repeat(numpy.arange(len(placed)), len(choices))
+        n = numpy.tile(choices, len(placed))
+        keep = placed[rows] + n <= electrons
+        rows, n = rows[keep], n[keep]
+
+        # Slater shielding of this shell from the electrons below it (see Atoms.buildShieldingRules).
+        if slot == 0:
+            shielding = 0.3 * (n - 1)
+        elif Atoms.azimuthalArray[slot] == "sp":
+            shielding = 0.35 * (n - 1) + placed[rows] - 0.15 * below[rows]
+        else:
+            shielding = 0.35 * (n - 1) + placed[rows]
+        newEnergy = energy[rows] + shellEnergies(atomicNumber, shielding, n.astype(float))
+        newPlaced = placed[rows] + n
+        left = electrons - newPlaced
+        keep = (n == 0) | (atomicNumber - shielding >= 0)  # no unbound shells
+        keep &= left <= capacityAfter[slot]  # the rest must still fit
+        keep &= newEnergy + bound[newPlaced, numpy.minimum(shellsAfter[slot], left)] <= threshold
+        rows, n, newEnergy, newPlaced = rows[keep], n[keep], newEnergy[keep], newPlaced[keep]
+
+        # Future shells only see (electrons placed, electrons in the current group), so count rows per state suffice.
+        newGroup = group[rows] + n
+        state = newPlaced * (electrons + 1) + newGroup
+        order = numpy.lexsort((newEnergy, state))
+        state = state[order]
+        first = numpy.concatenate([[True], state[1:] != state[:-1]]) if len(state) else numpy.zeros(0, dtype=bool)
+        starts = numpy.maximum.accumulate(numpy.where(first, numpy.arange(len(state)), 0))
+        order = order[numpy.arange(len(state)) - starts < count]
+
+        occupancies = occupancies[rows[order]]
+        occupancies[:, slot] = n[order]
+        placed, group, energy = newPlaced[order], newGroup[order], newEnergy[order]
+        below = below[rows[order]]
+
+    best = numpy.argsort(energy, kind="stable")[:count]
+    occupancies = occupancies[best]
+    return occupancies, Atoms.totalEnergies(atomicNumber, occupancies)
+
+
+def incumbentThreshold(atomicNumber, electrons, slots, count):
+    """An energy that at least count complete configurations reach, taken from the slot order filling and its single
+    and double excitations, so the search can prune anything that cannot beat it. Infinite if there are too few."""
+    try:
+        start = aufbauOccupancy(electrons, slots)
+    except ValueError:
+        return numpy.inf
+    padded = Atoms.padOccupancies([start])
+    limit = numpy.array([int(numpy.max(slots))])
+    singles = Atoms.excitations(padded, limit=limit)[0]
+    doubles = Atoms.excitations(singles, limit=numpy.repeat(limit, len(singles)))[0]
+    candidates = numpy.unique(numpy.concatenate([padded, singles, doubles]), axis=0)
+    allowed = numpy.zeros(Atoms.shellSlots, dtype=bool)
+    allowed[slots] = True
+    candidates = candidates[~(candidates[:, ~allowed] != 0).any(axis=1)]
+    shielding = Atoms.shieldingConstants(candidates)
+    bound = ~((candidates != 0) & (atomicNumber - shielding < 0)).any(axis=1)
+    energies = numpy.sort(Atoms.totalEnergies(atomicNumber, candidates[bound], shielding[bound]))
+    if len(energies) < count:
+        return numpy.inf
+    return energies[count - 1] + 1e-9 * abs(energies[count - 1])
+
+
+def describe(occupancy):
+    """Writes an occupancy as shell labels with electron counts, e.g. "1s2 2sp8 3sp8 3d6 4sp2"."""
+    return " ".join(Atoms.occupancylabels[i] + str(int(occupancy[i])) for i in numpy.flatnonzero(occupancy))
+
+
+def rankingTable(atomicNumber, occupancies, energies):
+    """Text table of ranked configurations as returned by lowestConfigurations."""
+    lines = ["Lowest Slater energy configurations for Z = " + str(atomicNumber)]
+    for i in range(len(energies)):
+        lines.append("{0:>3} {1:>16.6f}  {2}".format(i + 1, energies[i], describe(occupancies[i])))
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import time
+    for atomicNumber in [10, 26, 64]:
+        startTime = time.perf_counter()
+        occupancies, energies = lowestConfigurations(atomicNumber, count=5)
+        print(rankingTable(atomicNumber, occupancies, energies))
+        print("in", round((time.perf_counter() - startTime) * 1e3, 2), "ms\n")
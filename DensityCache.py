@@ -0,0 +1,136 @@
+"""Content-addressed result cache for Slater densities.
+
+Results are keyed by a hash of the atomic number, the occupancy tuple, the grid points and the requested derivative
+orders or grlaglll quantities. The in-memory tier is a least-recently-used store bounded by total bytes; an optional
+on-disk tier keeps one .npz file per result in a directory so results survive between sessions. Cached arrays are read-only and are
+returned without copying.
+"""
+import hashlib
+import os
+import zipfile
+from collections import OrderedDict
+import numpy
+import GridStretch
+import Slater
+
+
+def resultKey(kind, atom, arrayX, selection):
+    """Hashes everything a density result depends on into a hex digest. \n
+    kind -- name of the routine, e.g. "newDensity" \n
+    atom -- NewAtom object \n
+    arrayX -- array of radial positions or GridStretch.GridContext \n
+    selection -- the derivative orders or grlaglll quantities requested"""
+    if not isinstance(arrayX, GridStretch.GridContext):
+        arrayX = GridStretch.GridContext(arrayX)
+    digest = hashlib.sha1()
+    digest.update(repr((kind, int(atom.atomicNumber), tuple(float(n) for n in atom.occupancy), tuple(selection))).encode())
+    digest.update(arrayX.key.encode())
+    return digest.hexdigest()
+
+
+def readOnly(array):
+    """Marks an array as read-only so that cached results cannot be changed by the caller."""
+    array.setflags(write=False)
+    return array
+
+
+class DensityCache:
+    """An LRU cache of density results held in memory up to maxBytes, with an optional directory of .npz files
+    behind it."""
+
+    def __init__(self, maxBytes=256 * 1024 ** 2, directory=None):
+        self.maxBytes = maxBytes
+        self.directory = directory
+        self.entries = OrderedDict()  # key -> tuple of read-only arrays, most recently used last
+        self.currentBytes = 0
+        self.hits = 0
+        self.diskHits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def lookup(self, key, count):
+        """Returns the cached arrays for key, or None, checking memory first and then the disk. \n
+        count -- number of arrays the result is made of; an entry holding any other number is treated as a miss"""
+        arrays = self.entries.get(key)
+        if arrays is not None and len(arrays) == count:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return arrays
+        if self.directory is not None and os.path.exists(self.diskPath(key)):
+            try:
+                with numpy.load(self.diskPath(key)) as archive:
+                    arrays = tuple(archive["arr_" + str(i)] for i in range(len(archive.files)))
+            except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+                arrays = None
+            if arrays is not None and len(arrays) == count:
+                arrays = self.store(key, arrays, toDisk=False)
+                self.diskHits += 1
+                return arrays
+        self.misses += 1
+        return None
+
+    def store(self, key, arrays, toDisk=True):
+        """Adds a result to the cache, evicting the least recently used entries beyond maxBytes. On disk the arrays
+        go into a single .npz file that replaces any older one in one step, so a result is either all there or
+        missing."""
+        arrays = tuple(readOnly(array) for array in arrays)
+        size = sum(array.nbytes for array in arrays)
+        if key in self.entries:
+            self.currentBytes -= sum(array.nbytes for array in self.entries.pop(key))
+        if size <= self.maxBytes:
+            self.entries[key] = arrays
+            self.currentBytes += size
+            while self.currentBytes > self.maxBytes:
+                oldKey, oldArrays = self.entries.popitem(last=False)
+                self.currentBytes -= sum(array.nbytes for array in oldArrays)
+        if toDisk and self.directory is not None:
+            temporaryPath = self.diskPath(key) + ".tmp"
+            with open(temporaryPath, "wb") as file:
+                numpy.savez(file, *arrays)
+            os.replace(temporaryPath, self.diskPath(key))
+        return arrays
+
+    def diskPath(self, key):
+        """Path of the .npz file holding the result for key."""
+        return os.path.join(self.directory, key + ".npz")
+
+    def clear(self, disk=False):
+        """Empties the memory tier, and the disk tier too when disk is True."""
+        self.entries.clear()
+        self.currentBytes = 0
+        if disk and self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith(".npz") or name.endswith(".npz.tmp"):
+                    os.remove(os.path.join(self.directory, name))
+
+    def newDensity(self, arrayX, atom, orders=Slater.allOrders):
+        """Cached Slater.newDensity: returns read-only (total, components) arrays. The atom may be anything
+        Slater.toAtom accepts."""
+        orders = Slater.checkOrders(orders)
+        atom = Slater.toAtom(atom)
+        key = resultKey("newDensity", atom, arrayX, orders)
+        arrays = self.lookup(key, 2)
+        if arrays is None:
+            arrays = self.store(key, Slater.newDensity(arrayX, atom, orders))
+        return arrays
+
+    def grlaglll(self, arrayX, atom, quantities=Slater.grlaglllQuantities):
+        """Cached Slater.grlaglll: returns a tuple of read-only arrays, one per quantity."""
+        quantities = tuple(quantities)
+        atom = Slater.toAtom(atom)
+        key = resultKey("grlaglll", atom, arrayX, quantities)
+        arrays = self.lookup(key, 1)
+        if arrays is None:
+            out = numpy.empty((len(quantities), len(arrayX)))
+            Slater.grlaglll(arrayX, atom, quantities, out=out)
+            arrays = self.store(key, (out,))
+        return tuple(arrays[0])
+
+    def __repr__(self):
+        return ("DensityCache: " + str(len(self.entries)) + " entries, " + str(self.currentBytes) + " of " + str(self.maxBytes)
+                + " bytes, " + str(self.hits) + " hits, " + str(self.diskHits) + " disk hits, " + str(self.misses) + " misses")
+
+
+# Cache shared by everything in this process that does not make its own
+defaultCache = DensityCache()
@@ -1,4 +1,12 @@
+"""Reading and writing of density results: the JSON envelope used by JsonControlledSlater and a memory-mapped binary
+density store."""
+import base64
+import fractions
 import json
+import os
+import numpy
+import GridStretch
+import Instrumentation
 
 
 def openJsonFile(path):
@@ -11,15 +19,182 @@ def serializeJson(file):
     return jsonFile
 
 
-def saveToJson(atomList):
+def encodeArray(array, dtype="float64"):
+    """Packs an array into a JSON-friendly dictionary holding its little-endian bytes in base64, along with the dtype
+    and shape needed to decode it. dtype may be "float64" or "float32"."""
+    array = numpy.ascontiguousarray(array, dtype=numpy.dtype(dtype).newbyteorder("<"))
+    return {"encoding": "base64",
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+            "data": base64.b64encode(array.tobytes()).decode("ascii")}
 
-    dictionary = {
-        "plotType": "both",
-        "derivativeNumber": 0,
-        "scaleType": "exponential",
-        "plotRadius": 5,
-        "atoms": atomList
-    }
 
-    with open("C:/Users/Daniel/Desktop/outputJson.json", "w") as outfile:
-        json.dump(dictionary, outfile, indent=4)
+def decodeArray(value):
+    """Turns a value written by encodeArray, or a plain nested list of numbers, back into a numpy array."""
+    if isinstance(value, dict) and value.get("encoding") == "base64":
+        return numpy.frombuffer(base64.b64decode(value["data"]), dtype=numpy.dtype(value["dtype"])).reshape(value["shape"])
+    return numpy.array(value, dtype=float)
+
+
+def saveToJson(atomList, path="C:/Users/Daniel/Desktop/outputJson.json", encoding=None):
+    """Writes the atom list to a JSON file. \n
+    atomList -- list of dictionaries with "atomicNumber", "shellOccupation" and "dtyRaw" (an array or nested list) \n
+    path -- output file \n
+    encoding -- None to write dtyRaw as nested lists of decimal numbers, or "float64"/"float32" to write it as
+    base64 binary (see encodeArray); read either form back with decodeArray"""
+    with Instrumentation.span("FileIO.saveToJson"):
+        atoms = []
+        for atom in atomList:
+            atom = dict(atom)
+            if encoding is not None:
+                atom["dtyRaw"] = encodeArray(atom["dtyRaw"], encoding)
+            elif isinstance(atom["dtyRaw"], numpy.ndarray):
+                atom["dtyRaw"] = atom["dtyRaw"].tolist()
+            atoms.append(atom)
+
+        dictionary = {
+            "plotType": "both",
+            "derivativeNumber": 0,
+            "scaleType": "exponential",
+            "plotRadius": 5,
+            "atoms": atoms
+        }
+
+        with open(path, "w") as outfile:
+            json.dump(dictionary, outfile, indent=4)
+
+
+# File names inside a binary density store directory
+storeDataName = "densities.f8"  # raw little-endian float64 values of every grid and density, back to back
+storeIndexName = "index.json"
+
+
+def occupancyText(n):
+    """A shell occupancy as text without a decimal point: whole counts as integers, fractional ones as an exact
+    ratio such as "1/2"."""
+    return str(fractions.Fraction(float(n)))
+
+
+def configurationKey(atomicNumber, occupancy):
+    """Key identifying an atom and its configuration in a density store, e.g. "26:2.8.8.6.2" or "3:2.1/2"."""
+    return str(int(atomicNumber)) + ":" + ".".join(occupancyText(n) for n in occupancy)
+
+
+def writeDensityStore(directory, entries, append=True):
+    """Writes densities to a binary store: one flat float64 file that can be memory mapped, plus a small JSON index
+    giving the offset and shape of every array. Each grid is stored once, however many atoms use it. Records are keyed
+    by configurationKey alone, so writing a configuration that is already stored (on the same grid or another one)
+    replaces its record; the old values stay in the data file, counted in the index as "unused", until the store is
+    rewritten with compactDensityStore. \n
+    directory -- folder holding the store; created if needed \n
+    entries -- list of dictionaries with "atomicNumber", "name", "occupancy", "arrayX" (array or
+    GridStretch.GridContext), "orders" and "density" (a (len(orders), len(arrayX)) array) \n
+    append -- add to an existing store instead of replacing it"""
+    with Instrumentation.span("FileIO.writeDensityStore"):
+        os.makedirs(directory, exist_ok=True)
+        dataPath = os.path.join(directory, storeDataName)
+        indexPath = os.path.join(directory, storeIndexName)
+        if append and os.path.exists(indexPath):
+            with open(indexPath, "r") as file:
+                index = json.load(file)
+        else:
+            index = {"format": 1, "dtype": "<f8", "grids": {}, "records": {}, "unused": 0}
+            open(dataPath, "wb").close()
+        with open(dataPath, "ab") as data:
+            offset = data.tell() // 8
+
+            def write(array):
+                nonlocal offset
+                array = numpy.ascontiguousarray(array, dtype="<f8")
+                data.write(array.tobytes())
+                Instrumentation.count("bytes written: FileIO.writeDensityStore", array.nbytes)
+                offset += array.size
+                return offset - array.size
+
+            for entry in entries:
+                grid = entry["arrayX"]
+                if not isinstance(grid, GridStretch.GridContext):
+                    grid = GridStretch.GridContext(grid)
+                if grid.key not in index["grids"]:
+                    index["grids"][grid.key] = {"offset": write(grid.x), "length": len(grid)}
+                density = numpy.asarray(entry["density"], dtype=float)
+                key = configurationKey(entry["atomicNumber"], entry["occupancy"])
+                if key in index["records"]:
+                    index["unused"] = index.get("unused", 0) + int(numpy.prod(index["records"][key]["shape"]))
+                index["records"][key] = {"name": entry["name"],
+                                         "atomicNumber": int(entry["atomicNumber"]),
+                                         "occupancy": [int(n) if float(n).is_integer() else float(n) for n in entry["occupancy"]],
+                                         "gridId": grid.key,
+                                         "orders": [int(k) for k in entry["orders"]],
+                                         "offset": write(density),
+                                         "shape": list(density.shape)}
+        temporaryPath = indexPath + ".tmp"
+        with open(temporaryPath, "w") as file:
+            json.dump(index, file, indent=1)
+        os.replace(temporaryPath, indexPath)
+    return index
+
+
+def compactDensityStore(directory):
+    """Rewrites a density store keeping only the grids and densities its records still use, dropping the space left
+    behind by replaced records. \n
+    Returns: the new index"""
+    with Instrumentation.span("FileIO.compactDensityStore"):
+        store = DensityStore(directory)
+        entries = []
+        for key, record in store.index["records"].items():
+            entries.append({"atomicNumber": record["atomicNumber"], "name": record["name"], "occupancy": record["occupancy"],
+                            "arrayX": numpy.array(store.grid(record["gridId"])), "orders": record["orders"],
+                            "density": numpy.array(store.density(key))})
+        del store  # release the memory map before the data file is truncated
+        return writeDensityStore(directory, entries, append=False)
+
+
+class DensityStore:
+    """Read-only view of a binary density store written by writeDensityStore. The data file is memory mapped, so
+    every array handed out is a view into it and nothing is read until it is used."""
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, storeIndexName), "r") as file:
+            self.index = json.load(file)
+        dataPath = os.path.join(directory, storeDataName)
+        if os.path.getsize(dataPath) > 0:
+            self.data = numpy.memmap(dataPath, dtype=self.index["dtype"], mode="r")
+        else:
+            self.data = numpy.zeros(0)
+        self.names = {}  # element name -> configuration key, for lookups by name
+        for key, record in self.index["records"].items():
+            self.names.setdefault(record["name"], key)
+
+    def keys(self):
+        """Configuration keys of every atom in the store."""
+        return list(self.index["records"])
+
+    def record(self, atom):
+        """Index entry of an atom, given by name, configuration key or (atomicNumber, occupancy) pair."""
+        if isinstance(atom, tuple):
+            atom = configurationKey(*atom)
+        elif atom in self.names:
+            atom = self.names[atom]
+        return self.index["records"][atom]
+
+    def grid(self, gridId):
+        """The radial grid with the given id, as a view into the store."""
+        grid = self.index["grids"][gridId]
+        return self.data[grid["offset"]:grid["offset"] + grid["length"]]
+
+    def density(self, atom):
+        """The (orders, grid) density array of an atom, as a view into the store."""
+        record = self.record(atom)
+        size = int(numpy.prod(record["shape"]))
+        return self.data[record["offset"]:record["offset"] + size].reshape(record["shape"])
+
+    def curve(self, atom, order=0):
+        """Returns (arrayX, values) for one derivative order of one atom, both views into the store."""
+        record = self.record(atom)
+        return self.grid(record["gridId"]), self.density(atom)[record["orders"].index(order)]
+
+
+def openDensityStore(directory):
+    """Opens the binary density store in directory for reading."""
+    return DensityStore(directory)
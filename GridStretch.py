@@ -1,4 +1,6 @@
+import hashlib
 import numpy
+import Quadrature
 
 
 def ExpGridStretch1(N, minimumLength, a):
@@ -21,3 +23,140 @@ def ExpGridStretch2(listX):
     xN = listX[N]
     stretchedListX = x0 * numpy.exp(numpy.arange(N + 1) * numpy.log(xN / x0) / N)
     return stretchedListX
+
+
+def radialGrid(scaleType, listLength):
+    """The 0.01-spaced plotting grid out to listLength Bohr radii used by the GUI and the JSON jobs, stretched
+    exponentially (see ExpGridStretch2) when scaleType is "Exponential" in any capitalization."""
+    arrayX = numpy.arange(0.01, 1.0 * listLength, 0.01)
+    if str(scaleType).lower() == "exponential":
+        arrayX = ExpGridStretch2(arrayX)
+    return arrayX
+
+
+def gridChunks(start, stop, count, chunkSize=65536, scaleType="Uniform"):
+    """Generates a grid of count points from start to stop (both included) in blocks of at most chunkSize points,
+    without ever building the whole grid. scaleType "Exponential" (in any capitalization, as in radialGrid) gives the
+    same points as ExpGridStretch2 applied to a uniform grid with these end points; anything else gives uniformly
+    spaced points. A single point grid is just start, as with numpy.linspace."""
+    exponential = str(scaleType).lower() == "exponential"
+    intervals = max(count - 1, 1)
+    for first in range(0, count, chunkSize):
+        index = numpy.arange(first, min(first + chunkSize, count))
+        if exponential:
+            yield start * numpy.exp(index * numpy.log(stop / start) / intervals)
+        else:
+            yield start + index * ((stop - start) / intervals)
+
+
+class GridContext:
+    """An immutable radial grid that computes the arrays derived from it (reciprocal powers, r^2, 4 pi r^2, log r and
+    trapezoid or Simpson integration weights) once, on first use, so they can be shared by every shell, atom and derivative order
+    evaluated on it. Grids with the same points compare equal and hash alike, so caches can key on them.
+    Anything that takes an arrayX also accepts a GridContext."""
+    __slots__ = ("x", "key", "derived")
+
+    def __init__(self, arrayX):
+        x = numpy.array(arrayX, dtype=float)
+        x.setflags(write=False)
+        object.__setattr__(self, "x", x)
+        object.__setattr__(self, "key", hashlib.sha1(x.tobytes()).hexdigest())
+        object.__setattr__(self, "derived", {})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("GridContext is immutable")
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        return isinstance(other, GridContext) and self.key == other.key
+
+    def __len__(self):
+        return len(self.x)
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is not None and dtype != self.x.dtype:
+            return self.x.astype(dtype)
+        if copy:
+            return self.x.copy()
+        return self.x
+
+    def __repr__(self):
+        return "GridContext of " + str(len(self)) + " points from " + str(self.x[0]) + " to " + str(self.x[-1])
+
+    def cached(self, name, compute):
+        """Returns the derived array called name, computing it with compute() on first use."""
+        array = self.derived.get(name)
+        if array is None:
+            array = compute()
+            array.setflags(write=False)
+            self.derived[name] = array
+        return array
+
+    @property
+    def inverseX(self):
+        return self.cached("inverseX", lambda: 1 / self.x)
+
+    @property
+    def inverseX2(self):
+        return self.cached("inverseX2", lambda: self.inverseX * self.inverseX)
+
+    @property
+    def inverseX3(self):
+        return self.cached("inverseX3", lambda: self.inverseX2 * self.inverseX)
+
+    @property
+    def inverseX4(self):
+        return self.cached("inverseX4", lambda: self.inverseX2 * self.inverseX2)
+
+    @property
+    def xSquared(self):
+        return self.cached("xSquared", lambda: self.x * self.x)
+
+    @property
+    def shellVolume(self):
+        """4 pi r^2, which turns a density into a radial density."""
+        return self.cached("shellVolume", lambda: 4 * numpy.pi * self.xSquared)
+
+    @property
+    def logX(self):
+        return self.cached("logX", lambda: numpy.log(self.x))
+
+    @property
+    def positive(self):
+        """True when every grid point is greater than zero, so logX is finite everywhere."""
+        if "positive" not in self.derived:
+            self.derived["positive"] = bool(self.x.min() > 0)
+        return self.derived["positive"]
+
+    @property
+    def weights(self):
+        """Trapezoid-rule weights, so that numpy.dot(weights, f) integrates f over the grid."""
+        return self.cached("weights", lambda: Quadrature.trapezoidWeights(self.x))
+
+    @property
+    def spacing(self):
+        """How the points are spaced: "uniform", "logarithmic" (as from ExpGridStretch2) or "irregular"."""
+        if "spacing" not in self.derived:
+            self.derived["spacing"] = Quadrature.gridSpacing(self.x)
+        return self.derived["spacing"]
+
+    @property
+    def quadratureWeights(self):
+        """Simpson weights in r or in log r to suit the grid's spacing (see Quadrature.gridWeights), so that
+        values @ quadratureWeights integrates values over the grid."""
+        return self.cached("quadratureWeights", lambda: Quadrature.gridWeights(self.x, self.spacing))
+
+    @property
+    def radialWeights(self):
+        """quadratureWeights times 4 pi r^2, so that densities @ radialWeights gives the number of electrons."""
+        return self.cached("radialWeights", lambda: self.quadratureWeights * self.shellVolume)
+
+    def integrate(self, values):
+        """Integrates values, shaped (..., len(grid)), e.g. a stack of densities of many atoms, over the grid."""
+        return Quadrature.integrate(values, self.quadratureWeights)
+
+    def integrateRadial(self, density):
+        """Integrates 4 pi r^2 density over the grid: the electron count of each density in a stack."""
+        return Quadrature.integrate(density, self.radialWeights)
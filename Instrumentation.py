@@ -0,0 +1,125 @@
+"""Opt-in timers and counters for the hot paths of Slater, Atoms and FileIO.
+
+Nothing is recorded until enable() is called. While disabled, span() hands back one shared do-nothing context
+manager and the counting functions return immediately, so the instrumentation left in the code costs next to nothing.
+
+    import Instrumentation
+    Instrumentation.enable(trace=True)
+    ... run a sweep ...
+    print(Instrumentation.summaryTable())
+    Instrumentation.saveChromeTrace("trace.json")  # open in chrome://tracing or https://ui.perfetto.dev
+"""
+import json
+import os
+import threading
+import time
+
+enabled = False
+tracing = False
+spanTotals = {}  # span name -> [calls, total seconds]
+counters = {}  # counter name -> total
+traceEvents = []  # Chrome trace "complete" events, recorded only while tracing
+lock = threading.Lock()
+startTime = time.perf_counter()
+
+
+class NullSpan:
+    """The context manager span() returns while instrumentation is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+
+nullSpan = NullSpan()
+
+
+class Span:
+    """Times one named stage and adds it to the totals (and the trace, when tracing) on exit."""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.begin = time.perf_counter()
+        return self
+
+    def __exit__(self, *exception):
+        end = time.perf_counter()
+        with lock:
+            total = spanTotals.setdefault(self.name, [0, 0.0])
+            total[0] += 1
+            total[1] += end - self.begin
+            if tracing:
+                traceEvents.append({"name": self.name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                                    "ts": (self.begin - startTime) * 1e6, "dur": (end - self.begin) * 1e6})
+        return False
+
+
+def span(name):
+    """Returns a context manager timing the stage called name, e.g. with Instrumentation.span("Slater.exponentials"):"""
+    if not enabled:
+        return nullSpan
+    return Span(name)
+
+
+def count(name, amount=1):
+    """Adds amount to the counter called name, e.g. calls, shells evaluated or points evaluated."""
+    if not enabled:
+        return
+    with lock:
+        counters[name] = counters.get(name, 0) + amount
+
+
+def countBytes(name, nbytes):
+    """Adds an allocation of nbytes to the byte counter called name."""
+    count("bytes allocated: " + name, nbytes)
+
+
+def enable(trace=False):
+    """Starts recording; with trace=True every span is also kept as a Chrome trace event."""
+    global enabled, tracing
+    enabled = True
+    tracing = trace
+
+
+def disable():
+    """Stops recording. What was recorded so far is kept until reset()."""
+    global enabled, tracing
+    enabled = False
+    tracing = False
+
+
+def reset():
+    """Discards everything recorded so far."""
+    global startTime
+    with lock:
+        spanTotals.clear()
+        counters.clear()
+        del traceEvents[:]
+        startTime = time.perf_counter()
+
+
+def summaryTable():
+    """Returns the recorded spans (slowest first) and counters as a text table."""
+    lines = ["{0:<40} {1:>10} {2:>12} {3:>12}".format("span", "calls", "total ms", "ms per call")]
+    for name, (calls, seconds) in sorted(spanTotals.items(), key=lambda item: -item[1][1]):
+        lines.append("{0:<40} {1:>10} {2:>12.3f} {3:>12.5f}".format(name, calls, seconds * 1e3, seconds * 1e3 / calls))
+    lines.append("")
+    lines.append("{0:<40} {1:>10}".format("counter", "total"))
+    for name in sorted(counters):
+        lines.append("{0:<40} {1:>10}".format(name, counters[name]))
+    return "\n".join(lines)
+
+
+def chromeTrace():
+    """Returns the recorded trace in the Chrome trace event JSON format, with the counters as metadata."""
+    return {"traceEvents": list(traceEvents), "displayTimeUnit": "ms", "otherData": dict(counters)}
+
+
+def saveChromeTrace(path):
+    """Writes chromeTrace() to a file."""
+    with open(path, "w") as file:
+        json.dump(chromeTrace(), file)
@@ -1,95 +1,159 @@
 """A means of accessing the functionality of SlaterGUI.py without a GUI.
    By Daniel Isenberg
-   Stuff to do: Consider refactoring the input orbital configuration for atoms so that they are integer lists instead of strings to save an extra step in converting it. (It only took string input originally because of the manual input system I started with)
-                Consider refactoring Slater.density() so that it only returns the component contributions, which can then be added together later so it only has to return one thing instead of a tuple.
-                Refactor pretty much everything here so it works with all the changes made to regular Slater, ie usage of atom object, etc.
+   Reworked into a headless command-line tool for batch pipelines:
+
+       python JsonControlledSlater.py inputJson.json outputDirectory [--workers N] [--figures] [--encoding float32]
+                                                                   [--profile]
+
+   The input job file has the same layout as the JSON written by FileIO.saveToJson: "plotType", "derivativeNumber",
+   "scaleType", "plotRadius" and a list of "atoms", each with an "atomicNumber" and a "shellOccupation" given either
+   as a period separated string ("2.8.1") or as a list of integers. Atoms may instead name an element from
+   Atoms.atomData with "name". The radial densities 4 pi r^2 rho and their derivatives are written to
+   outputJson.json in the output directory, and optionally to a binary density store and to one PNG figure per atom.
+
+   Exit codes: 0 on success, 1 if the job file cannot be read or is invalid, 2 for bad command-line arguments,
+   3 if evaluating or writing the results fails.
 """
-import Slater
-import inputFunctions
-import numpy
-import matplotlib.pyplot as plt
+import argparse
+import os
+import sys
+import time
+import Atoms
 import FileIO
+import GridStretch
+import Instrumentation
+import ParallelSweep
+import Slater
 
+exitSuccess = 0
+exitBadJob = 1
+exitFailure = 3
 
-json = FileIO.openJsonFile("C:/Users/Daniel/Desktop/inputJson.json")
-serializedJson = FileIO.serializeJson(json)
 
+def parseOccupation(shellOccupation):
+    """Converts a shell occupation given as a period separated string or a list into a list of integers."""
+    if isinstance(shellOccupation, str):
+        shellOccupation = [part for part in shellOccupation.strip().strip(".").split(".")]
+    return [int(n) for n in shellOccupation]
 
-labelList = ["cumulative density", "1s subshell", "2s&p subshell", "3s&p subshell", "3d subshell", "4s&p subshell", "4d subshell", "4f subshell", "5s&p subshell", "5d subshell"]
-run = True
 
-atomList = []
-atomicNumberList = []
-shellOccupationList = []
-dtyList = []
+def readJob(path):
+    """Reads and checks a job file, returning its settings and the list of atoms to evaluate."""
+    with FileIO.openJsonFile(path) as file:
+        job = FileIO.serializeJson(file)
+    atoms = []
+    for entry in job["atoms"]:
+        if "shellOccupation" in entry:
+            atomicNumber = int(entry["atomicNumber"])
+            name = entry.get("name", str(atomicNumber))
+            atoms.append(Atoms.defaultFactory.get(atomicNumber, parseOccupation(entry["shellOccupation"]), name))
+        else:
+            atoms.append(Slater.toAtom(entry["name"]))
+    settings = {"plotType": job.get("plotType", "both"),
+                "derivativeNumber": int(job.get("derivativeNumber", 0)),
+                "scaleType": job.get("scaleType", "Uniform"),
+                "plotRadius": job.get("plotRadius", 5)}
+    return settings, atoms
+
+
+def saveFigure(path, grid, atom, density, components, settings):
+    """Plots one atom the same way SlaterGUI does and saves it to path without opening a window. components holds
+    the shell densities of the plotted derivative only, as from Slater.newDensity with orders=[derivativeNumber]."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    plotType = settings["plotType"]
+    derivativeNumber = settings["derivativeNumber"]
+    figure = plt.figure()
+    if plotType == "cumulative" or plotType == "both":
+        plt.plot(grid.x, density[derivativeNumber], label="cumulative density")
+    if plotType == "components" or plotType == "both":
+        for i in range(len(components)):
+            if atom.occupancy[i] != 0:
+                plt.plot(grid.x, grid.shellVolume * components[i][0], label=Atoms.occupancylabels[i] + " subshell")
+    plt.title("Radial density (derivative " + str(derivativeNumber) + ") for atomic number " + str(atom.atomicNumber)
+              + "\nScale type: " + settings["scaleType"])
+    plt.xlabel("Distance from atomic center r (Bohr radii)")
+    plt.ylabel(r'$4\pi r^2 \rho (r)$')
+    plt.legend()
+    plt.grid()
+    figure.savefig(path)
+    plt.close(figure)
 
-for atom in range(len(serializedJson["atoms"])):
-    plotType = serializedJson["plotType"]
-    derivativeNumber = serializedJson["derivativeNumber"]
-    scaleType = serializedJson["scaleType"]
-    arrayX = inputFunctions.getArrayXFromJSON(scaleType, serializedJson["plotRadius"])
-    atomicNumber = serializedJson["atoms"][atom]["atomicNumber"]
-    print("Atom index is " + str(atom))
-    print("Atomic Number for current atom is " + str(atomicNumber))
-    orbitalConfigList = inputFunctions.getElectronConfigFromJson(serializedJson["atoms"][atom]["shellOccupation"])
 
-    dty, components = Slater.density(arrayX, atomicNumber, orbitalConfigList)
-    # dty = Slater.grlaglll(arrayX, atomicNumber, orbitalConfigList)
-    dty = 4 * numpy.pi * arrayX ** 2 * dty
-    yList = []
-    yListMaster = []
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate Slater densities for every atom in a JSON job file.")
+    parser.add_argument("job", help="input job file (JSON)")
+    parser.add_argument("output", help="directory to write results into")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes (default 1)")
+    parser.add_argument("--encoding", choices=["float64", "float32"], default=None,
+                        help="write dtyRaw as base64 binary instead of decimal lists")
+    parser.add_argument("--store", action="store_true", help="also write a memory-mapped binary density store")
+    parser.add_argument("--figures", action="store_true", help="save a PNG figure per atom")
+    parser.add_argument("--quiet", action="store_true", help="do not report progress")
+    parser.add_argument("--profile", action="store_true",
+                        help="time each stage, print a summary and write trace.json (Chrome trace) to the output directory; "
+                             "with --workers above 1 only the parent process is recorded, not the work done in the workers")
+    arguments = parser.parse_args(argv)
 
-    if plotType == "cumulative" or plotType == "both":  # Plots the density of the entire system as a single data set.
-        for i in range(len(arrayX)):
-            yList.append(dty[derivativeNumber][i])
-        yListMaster.append(yList)
+    def report(message):
+        if not arguments.quiet:
+            print(message, file=sys.stderr, flush=True)
 
-    if plotType == "components" or plotType == "both":  # Plots the density of each individual shell without considering screening from other shells, each as its own data set.
-        for index in range(len(components)):
-            components[index][derivativeNumber] = 4 * numpy.pi * arrayX ** 2 * components[index][derivativeNumber]
-            yListMaster.append(components[index][derivativeNumber])
+    if arguments.profile:
+        Instrumentation.enable(trace=True)
+    try:
+        settings, atoms = readJob(arguments.job)
+    except (OSError, ValueError, KeyError, TypeError, IndexError) as error:
+        print("Could not read job file " + arguments.job + ": " + repr(error), file=sys.stderr)
+        return exitBadJob
 
-    for i in range(len(yListMaster)):  # This ensures that labels in the legend are applied correctly by skipping the first label in the list of label handles if the cumulative plot is not present.
-        if plotType == "cumulative" or plotType == "both":
-            plt.plot(arrayX, yListMaster[i], label=labelList[i])
+    try:
+        startTime = time.perf_counter()
+        grid = GridStretch.GridContext(GridStretch.radialGrid(settings["scaleType"], settings["plotRadius"]))
+        report("Evaluating " + str(len(atoms)) + " atoms on " + str(len(grid)) + " grid points with "
+               + str(arguments.workers) + " worker(s)")
+        if arguments.workers > 1:
+            densities = ParallelSweep.parallelSweep(grid, atoms, workers=arguments.workers)
         else:
-            plt.plot(arrayX, yListMaster[i], label=labelList[i + 1])
-
-    if derivativeNumber != 0:  # makes the title reflect whether you are plotting just the density or one of it's derivatives.
-        plt.title("Plot of charge density (" + inputFunctions.derivativeOptions[derivativeNumber] + ") vs. radius for atomic number " + str(atomicNumber) + "\nScale type: " + scaleType)
-    else:
-        plt.title("Plot of charge density vs. radius for atomic number " + str(atomicNumber) + "\nScale type: " + scaleType)
-    plt.xlabel("Distance from atomic center (Bohr radii)")
-    plt.ylabel("Radial electron density")
-    plt.legend()
-    plt.grid()
-    plt.show()
-
-    atomicNumberList.append(atomicNumber)
-    shellOccupationList.append(orbitalConfigList)
-    dtyList.append(dty)
-for i in range(len(atomicNumberList)):
-    atomList.append(
-        {
-            "atomicNumber": atomicNumberList[i],
-            "shellOccupation": shellOccupationList[i],
-            "dtyRaw": dtyList[i].tolist()
-        }
-    )
-
-
-encodedNumpyData = FileIO.saveToJson(atomList)
-
-outputListTest = []
-outTest = FileIO.openJsonFile("C:/Users/Daniel/Desktop/outputJson.json")
-serializedOutTest = FileIO.serializeJson(outTest)
-for i in range(len(serializedOutTest["atoms"])):
-    testListY = serializedOutTest["atoms"][i]["dtyRaw"][0]
-    testListX = inputFunctions.getArrayXFromJSON(scaleType, serializedJson["plotRadius"])
-    plt.plot(testListX, testListY, label="cumulative density")
-    plt.title("Cumulative density for atomic number " + str(serializedOutTest["atoms"][i]["atomicNumber"]) + " retrieved from saved json file")
-    plt.xlabel("Distance from atomic center (Bohr radii)")
-    plt.ylabel("Radial electron density")
-    plt.legend()
-    plt.grid()
-    plt.show()
+            densities = Slater.batchDensity(grid, atoms)
+        densities = grid.shellVolume * densities
+        report("Evaluated densities in " + str(round(time.perf_counter() - startTime, 3)) + " s")
+
+        os.makedirs(arguments.output, exist_ok=True)
+        atomList = []
+        for i in range(len(atoms)):
+            atomList.append({"atomicNumber": atoms[i].atomicNumber,
+                             "shellOccupation": atoms[i].occupancy.tolist(),
+                             "dtyRaw": densities[i]})
+        FileIO.saveToJson(atomList, os.path.join(arguments.output, "outputJson.json"), arguments.encoding)
+        report("Wrote " + os.path.join(arguments.output, "outputJson.json"))
+
+        if arguments.store:
+            FileIO.writeDensityStore(os.path.join(arguments.output, "store"),
+                                     [{"atomicNumber": atoms[i].atomicNumber, "name": atoms[i].name,
+                                       "occupancy": atoms[i].occupancy, "arrayX": grid, "orders": Slater.allOrders,
+                                       "density": densities[i]} for i in range(len(atoms))], append=False)
+            report("Wrote " + os.path.join(arguments.output, "store"))
+
+        if arguments.figures:
+            os.makedirs(os.path.join(arguments.output, "figures"), exist_ok=True)
+            for i in range(len(atoms)):
+                components = Slater.newDensity(grid, atoms[i], orders=[settings["derivativeNumber"]])[1]
+                path = os.path.join(arguments.output, "figures", str(i) + "_Z" + str(atoms[i].atomicNumber) + ".png")
+                saveFigure(path, grid, atoms[i], densities[i], components, settings)
+                report("[" + str(i + 1) + "/" + str(len(atoms)) + "] wrote " + path)
+    except Exception as error:
+        print("Failed: " + repr(error), file=sys.stderr)
+        return exitFailure
+
+    report("Done in " + str(round(time.perf_counter() - startTime, 3)) + " s")
+    if arguments.profile:
+        Instrumentation.saveChromeTrace(os.path.join(arguments.output, "trace.json"))
+        print(Instrumentation.summaryTable(), file=sys.stderr)
+    return exitSuccess
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Parallel sweeps of Slater densities over many atoms and configurations.
+
+The radial grid and the output array live in shared memory, so worker processes read the grid and write their
+results in place instead of pickling arrays back and forth. Atoms are handed out in fixed-size blocks that do not
+depend on the number of workers, so the results are identical however many processes are used.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy
+import Atoms
+import Slater
+
+# Shared arrays as seen from inside a worker process, set up by attachShared()
+sharedGrid = None
+sharedOutput = None
+sharedBlocks = []
+
+
+def describe(atom):
+    """Reduces an atom (anything Slater.toAtom accepts) to a small picklable (atomicNumber, name, occupancy) tuple."""
+    atom = Slater.toAtom(atom)
+    return atom.atomicNumber, atom.name, atom.occupancy
+
+
+def attachShared(gridName, gridLength, outputName, outputShape):
+    """Worker initializer: maps the shared grid and output arrays into this process."""
+    global sharedGrid, sharedOutput
+    gridBlock = shared_memory.SharedMemory(name=gridName)
+    outputBlock = shared_memory.SharedMemory(name=outputName)
+    sharedBlocks.extend([gridBlock, outputBlock])  # keep the mappings alive for the life of the worker
+    sharedGrid = numpy.ndarray((gridLength,), dtype=float, buffer=gridBlock.buf)
+    sharedOutput = numpy.ndarray(outputShape, dtype=float, buffer=outputBlock.buf)
+
+
+def sweepBlock(first, configurations, orders):
+    """Evaluates one block of configurations into rows first, first + 1, ... of the shared output."""
+    atoms = [Atoms.defaultFactory.get(atomicNumber, occupancy, name) for atomicNumber, name, occupancy in configurations]
+    Slater.batchDensity(sharedGrid, atoms, orders, out=sharedOutput[first:first + len(atoms)])
+    return first
+
+
+def parallelSweep(arrayX, atoms, orders=Slater.allOrders, workers=None, blockSize=8):
+    """Evaluates the total densities of many atoms on one grid across a pool of worker processes. \n
+    arrayX -- array of radial positions or GridStretch.GridContext \n
+    atoms -- list of NewAtom objects, (atomicNumber, occupancy) pairs or element names from Atoms.atomData \n
+    orders -- radial derivative orders to compute (see Slater.shellKernel) \n
+    workers -- number of worker processes; defaults to the number of CPUs, and 1 runs everything in this process \n
+    blockSize -- number of atoms handed to a worker at a time \n
+    Returns: an (atoms, len(orders), len(arrayX)) array, the same as Slater.batchDensity."""
+    global sharedGrid, sharedOutput
+    arrayX = numpy.asarray(arrayX, dtype=float)
+    orders = Slater.checkOrders(orders)
+    configurations = [describe(atom) for atom in atoms]
+    shape = (len(configurations), len(orders), len(arrayX))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    blocks = [(first, configurations[first:first + blockSize]) for first in range(0, len(configurations), blockSize)]
+
+    gridBlock = shared_memory.SharedMemory(create=True, size=max(arrayX.nbytes, 1))
+    outputBlock = shared_memory.SharedMemory(create=True, size=max(int(numpy.prod(shape)) * 8, 1))
+    try:
+        grid = numpy.ndarray(arrayX.shape, dtype=float, buffer=gridBlock.buf)
+        grid[...] = arrayX
+        output = numpy.ndarray(shape, dtype=float, buffer=outputBlock.buf)
+        if workers == 1 or len(blocks) <= 1:
+            sharedGrid, sharedOutput = grid, output
+            try:
+                for first, block in blocks:
+                    sweepBlock(first, block, orders)
+            finally:
+                sharedGrid, sharedOutput = None, None
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=attachShared,
+                                     initargs=(gridBlock.name, len(arrayX), outputBlock.name, shape)) as pool:
+                for future in [pool.submit(sweepBlock, first, block, orders) for first, block in blocks]:
+                    future.result()
+        result = output.copy()
+        del grid, output
+    finally:
+        gridBlock.close()
+        gridBlock.unlink()
+        outputBlock.close()
+        outputBlock.unlink()
+    return result
+
+
+if __name__ == "__main__":
+    import time
+    x = numpy.arange(0.01, 10.0, 0.01)
+    for count in [1, 2, 4]:
+        startTime = time.perf_counter()
+        densities = parallelSweep(x, list(Atoms.atomData), workers=count)
+        print(count, "workers:", densities.shape, "in", round(time.perf_counter() - startTime, 3), "s")
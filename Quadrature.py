@@ -0,0 +1,116 @@
+"""Quadrature weights for integrating over radial grids.
+
+Weights are returned as arrays w such that values @ w integrates values over the grid, so a stack of densities of
+many atoms, shaped (..., len(grid)), is integrated with a single matrix-vector product. Uniform grids use composite
+Simpson weights. Log-uniform grids, such as those from GridStretch.ExpGridStretch2, use Simpson weights in
+u = log r with the Jacobian dr = r du. Other grids fall back to the trapezoid rule. Only the range covered by the
+grid is integrated; nothing is added for r below the first point or beyond the last.
+
+Integrals of Slater densities over all space need no grid at all: each shell's radial density is
+r^(2 n*) exp(-2 zeta r) times a constant, so Gauss-Laguerre nodes scaled by that shell's own exponent integrate it to
+near machine precision with a few dozen points (see shellIntegrals and atomIntegrals).
+"""
+import numpy
+
+laguerreRules = {}  # node count -> (nodes, weights), see laguerreRule
+
+
+def simpsonWeights(count, h):
+    """Composite Simpson weights for count equally spaced points h apart. With an odd number of intervals the last
+    three intervals use Simpson's 3/8 rule; two points fall back to the trapezoid rule."""
+    w = numpy.zeros(count)
+    if count < 2:
+        return w
+    if count == 2:
+        w[:] = h / 2
+        return w
+    intervals = count - 1
+    simpsonEnd = intervals if intervals % 2 == 0 else intervals - 3  # last point covered by the 1/3 rule
+    if simpsonEnd > 0:
+        w[0:simpsonEnd + 1:2] += 2 * h / 3
+        w[1:simpsonEnd:2] += 4 * h / 3
+        w[0] -= h / 3
+        w[simpsonEnd] -= h / 3
+    if simpsonEnd != intervals:
+        w[simpsonEnd:] += numpy.array([1.0, 3.0, 3.0, 1.0]) * (3 * h / 8)
+    return w
+
+
+def trapezoidWeights(x):
+    """Trapezoid rule weights for any increasing grid."""
+    w = numpy.zeros(len(x))
+    h = numpy.diff(x)
+    w[:-1] += h / 2
+    w[1:] += h / 2
+    return w
+
+
+def gridSpacing(x, rtol=1e-8):
+    """Classifies a grid as "uniform" (equal steps in r), "logarithmic" (equal steps in log r) or "irregular"."""
+    x = numpy.asarray(x, dtype=float)
+    if len(x) < 3:
+        return "uniform"
+    h = numpy.diff(x)
+    if numpy.allclose(h, h[0], rtol=rtol, atol=0):
+        return "uniform"
+    if x[0] > 0:
+        du = numpy.diff(numpy.log(x))
+        if numpy.allclose(du, du[0], rtol=rtol * 1e3, atol=0):
+            return "logarithmic"
+    return "irregular"
+
+
+def gridWeights(x, spacing=None):
+    """High-order weights for a radial grid: Simpson in r on a uniform grid, Simpson in log r on a log-uniform grid
+    and the trapezoid rule otherwise. \n
+    x -- increasing grid points \n
+    spacing -- "uniform", "logarithmic" or "irregular"; detected with gridSpacing when not given"""
+    x = numpy.asarray(x, dtype=float)
+    if spacing is None:
+        spacing = gridSpacing(x)
+    if spacing == "uniform":
+        return simpsonWeights(len(x), (x[-1] - x[0]) / max(len(x) - 1, 1))
+    if spacing == "logarithmic":
+        return simpsonWeights(len(x), numpy.log(x[-1] / x[0]) / max(len(x) - 1, 1)) * x
+    return trapezoidWeights(x)
+
+
+def integrate(values, weights):
+    """Integrates values, shaped (..., len(weights)), over the grid the weights belong to."""
+    return numpy.asarray(values) @ weights
+
+
+def laguerreRule(count):
+    """Gauss-Laguerre nodes t and weights w, for which sum(w * g(t)) approximates the integral of exp(-t) g(t) from 0
+    to infinity. Cached per count."""
+    rule = laguerreRules.get(count)
+    if rule is None:
+        rule = numpy.polynomial.laguerre.laggauss(count)
+        for array in rule:
+            array.setflags(write=False)
+        laguerreRules[count] = rule
+    return rule
+
+
+def shellIntegrals(table, function=None, count=32):
+    """Integral of function(r) 4 pi r^2 rho_s(r) over all space for every shell s of a Slater shell table, with
+    rho_s evaluated only at the shell's own Gauss-Laguerre nodes. \n
+    function -- vectorized function of r; None integrates the density itself, giving each shell's occupancy \n
+    count -- nodes per shell"""
+    decay = 2 * numpy.asarray(table.exponent, dtype=float)
+    if numpy.any(decay <= 0):
+        raise ValueError("Gauss-Laguerre nodes need bound shells with a positive exponent")
+    t, w = laguerreRule(count)
+    r = t / decay[:, None]
+    # 4 pi r^2 rho_s = 4 pi A^2 N r^(2 n*) exp(-2 zeta r), and exp(-2 zeta r) = exp(-t) is the Laguerre weight.
+    values = r ** (2 * numpy.asarray(table.power)[:, None] + 2)
+    values *= w
+    if function is not None:
+        values *= function(r)
+    return values.sum(axis=1) * (4 * numpy.pi * numpy.asarray(table.densityScale) / decay)
+
+
+def atomIntegrals(table, atomCount, function=None, count=32):
+    """Integral of function(r) 4 pi r^2 rho(r) over all space for every atom of a combined shell table (see
+    Slater.shellTable or Slater.AtomModel.fromConfigurations), summing shellIntegrals by table.atomIndex."""
+    return numpy.bincount(table.atomIndex, weights=shellIntegrals(table, function, count), minlength=atomCount)
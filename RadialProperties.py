@@ -0,0 +1,129 @@
+"""Closed-form radial properties of Slater densities, without any grid.
+
+The radial density of a shell with occupancy N, effective quantum number n* and exponent zeta = (Z - s) / n* is
+4 pi r^2 rho(r) = N (2 zeta)^(2n* + 1) r^(2n*) exp(-2 zeta r) / Gamma(2n* + 1), so for each shell
+    <r^k>      = Gamma(2n* + 1 + k) / (Gamma(2n* + 1) (2 zeta)^k)    for k > -(2n* + 1)
+    N(r)       = N P(2n* + 1, 2 zeta r)                             (electrons inside radius r)
+    peak       = n* / zeta = n*^2 / (Z - s)                         (maximum of 4 pi r^2 rho)
+with P the regularized lower incomplete gamma function. Per-atom values sum the shells. Every function works on a
+whole shell table at once, so many atoms cost about the same as one.
+
+The shell-level functions take a Slater.AtomModel. The atom-level ones take a list of anything Slater.toAtom
+accepts, or an Atoms.ConfigurationSet.
+"""
+import numpy
+import Atoms
+import Gamma
+import Slater
+
+
+def compiled(atoms):
+    """The shell table of a list of atoms or of an Atoms.ConfigurationSet, and the number of atoms in it. The closed
+    forms need every shell to be bound, so a table with an exponent <= 0 raises ValueError."""
+    if isinstance(atoms, Atoms.ConfigurationSet):
+        table, count = atoms.model(), len(atoms)
+    else:
+        atoms = [Slater.toAtom(atom) for atom in atoms]
+        table, count = Slater.shellTable(atoms), len(atoms)
+    if numpy.any(table.exponent <= 0):
+        unbound = numpy.unique(table.atomIndex[table.exponent <= 0])
+        raise ValueError("closed-form radial properties need bound shells with a positive exponent; atoms "
+                         + str(unbound.tolist()) + " have unbound shells")
+    return table, count
+
+
+def shellMoments(table, k):
+    """<r^k> of one electron in each shell of a shell table. k may be any real number above -(2n* + 1), e.g. -1
+    for <1/r>."""
+    a = 2 * table.nStar + 1
+    return numpy.exp(Gamma.lgamma(a + k) - Gamma.lgamma(a)) / (2 * table.exponent) ** k
+
+
+def shellCharge(table, radius):
+    """Electrons of each shell inside radius. \n
+    radius -- a number or an array of radii \n
+    Returns: a (shells,) array, or (shells, len(radius)) for an array of radii"""
+    radius = numpy.asarray(radius, dtype=float)
+    a = (2 * table.nStar + 1).reshape((-1,) + (1,) * radius.ndim)
+    decay = (2 * table.exponent).reshape(a.shape)
+    return table.occupancy.reshape(a.shape) * Gamma.regularizedGamma(a, decay * radius)
+
+
+def shellPeakRadii(table):
+    """Radius at which each shell's radial density 4 pi r^2 rho peaks, n* / zeta = n*^2 / (Z - s)."""
+    return table.nStar / table.exponent
+
+
+def sumByAtom(table, count, values):
+    """Adds up per-shell values, shaped (shells, ...), into one row per atom of the table."""
+    present, starts = numpy.unique(table.atomIndex, return_index=True)
+    out = numpy.zeros((count,) + values.shape[1:])
+    if len(present) > 0:
+        out[present] = numpy.add.reduceat(values, starts, axis=0)
+    return out
+
+
+def moments(atoms, k):
+    """The integral of r^k rho over all space for each atom: the sum of N <r^k> over its shells. k = 0 gives the
+    number of electrons; divide by it for the mean per electron."""
+    table, count = compiled(atoms)
+    return sumByAtom(table, count, table.occupancy * shellMoments(table, k))
+
+
+def cumulativeCharge(atoms, radius):
+    """Electrons inside radius for each atom. \n
+    radius -- a number or an array of radii \n
+    Returns: an (atoms,) array, or (atoms, len(radius)) for an array of radii"""
+    table, count = compiled(atoms)
+    return sumByAtom(table, count, shellCharge(table, radius))
+
+
+def chargeRadius(atoms, fraction=0.5, tolerance=1e-12, maxDoublings=200):
+    """Radius enclosing the given fraction of each atom's electrons, found by bisection on the closed-form N(r) for
+    all atoms at once. \n
+    fraction -- share of the electrons to enclose, greater than 0 and at most 1 \n
+    maxDoublings -- how many times the search bracket may be doubled before giving up with ValueError"""
+    if not 0 < fraction <= 1:
+        raise ValueError("fraction must be greater than 0 and at most 1, got " + repr(fraction))
+    table, count = compiled(atoms)
+    target = fraction * sumByAtom(table, count, table.occupancy)
+    a = 2 * table.nStar + 1
+
+    def enclosed(radius):
+        return sumByAtom(table, count, table.occupancy * Gamma.regularizedGamma(a, 2 * table.exponent * radius[table.atomIndex]))
+
+    low = numpy.zeros(count)
+    high = numpy.ones(count)
+    for _ in range(maxDoublings):
+        short = enclosed(high) < target
+        if not short.any():
+            break
+        high = numpy.where(short, 2 * high, high)
+    else:
+        raise ValueError("no radius up to " + str(high.max()) + " encloses the requested charge")
+    while numpy.any(high - low > tolerance * high):
+        middle = (low + high) / 2
+        below = enclosed(middle) < target
+        low = numpy.where(below, middle, low)
+        high = numpy.where(below, high, middle)
+    return (low + high) / 2
+
+
+def summaryTable(atoms):
+    """Text table of the main radial properties of each atom: the electron count, <r>, <r^2> and <1/r> per
+    electron, the radius holding half the electrons and the peak radius of the outermost shell."""
+    table, count = compiled(atoms)
+    names = atoms.label if isinstance(atoms, Atoms.ConfigurationSet) else (lambda i: Slater.toAtom(atoms[i]).name)
+    electrons = moments(atoms, 0)
+    perElectron = numpy.maximum(electrons, 1e-300)
+    columns = [moments(atoms, 1) / perElectron, moments(atoms, 2) / perElectron, moments(atoms, -1) / perElectron,
+               chargeRadius(atoms)]
+    peaks = numpy.zeros(count)
+    outermost = numpy.flatnonzero(numpy.append(table.atomIndex[1:] != table.atomIndex[:-1], True)) if len(table) else []
+    peaks[table.atomIndex[outermost]] = shellPeakRadii(table)[outermost]
+    lines = ["{0:<24} {1:>9} {2:>12} {3:>12} {4:>12} {5:>12} {6:>12}".format(
+        "atom", "electrons", "<r>", "<r^2>", "<1/r>", "half radius", "outer peak")]
+    for i in range(count):
+        lines.append("{0:<24} {1:>9.4f} {2:>12.6f} {3:>12.6f} {4:>12.6f} {5:>12.6f} {6:>12.6f}".format(
+            str(names(i)), electrons[i], columns[0][i], columns[1][i], columns[2][i], columns[3][i], peaks[i]))
+    return "\n".join(lines)
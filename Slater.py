@@ -13,11 +13,22 @@ __version__ == "Stable"
 __documenter__ == "Antonio Cancio"
 """
 
+import math
+from concurrent.futures import ThreadPoolExecutor
 import numpy
 import Gamma
+import Atoms
+import GridStretch
+import Instrumentation
+import Quadrature
 
 # The effective energy level dict
 nStar = {1: 1.0, 2: 2.0, 3: 3.0, 4: 3.7, 5: 4.0, 6: 4.2, 7: 4.1}  # item 7 is a guess
+# Gamma(2n* + 1) for each effective energy level, shared by every normalization constant
+nStarGamma = dict(zip(nStar, Gamma.realGamma(2.0 * numpy.array(list(nStar.values())) + 1.0)))
+# The same two tables as arrays indexed by principal quantum number, for looking up many shells at once
+nStarTable = numpy.array([numpy.nan] + [nStar[e] for e in sorted(nStar)])
+nStarGammaTable = numpy.array([numpy.nan] + [nStarGamma[e] for e in sorted(nStar)])
 
 
 """ e -> energyQuantumNumber  # This was put here to remind myself (Daniel) what the original variable names were, in case I missed something somewhere so I can be consistent with how I rename them.
@@ -32,7 +43,7 @@ def A(shielding, energyQuantumNumber, netCharge):
         print("Fatal Error: UNBOUND ATOM")
         print("Shielding charge {0} exceeds nuclear charge {1} ".format(shielding, netCharge))
         print("Results will likely be nonsensical!")
-    normalizationConstant = numpy.sqrt((2.0 * (netCharge - shielding)) ** (2.0 * nx + 1) / (4.0 * numpy.pi * nx ** (2.0 * nx + 1) * Gamma.gamma(2 * nx + 1.0)))
+    normalizationConstant = numpy.sqrt((2.0 * (netCharge - shielding)) ** (2.0 * nx + 1) / (4.0 * numpy.pi * nx ** (2.0 * nx + 1) * nStarGamma[energyQuantumNumber]))
     return normalizationConstant
 
 
@@ -78,53 +89,463 @@ def n(shielding, energyQuantumNumber, netCharge, arrayX, N):
     return returnList'''
 
 
-def newDensity(arrayX, atom):
+class AtomModel:
+    """The occupied shells of an atom compiled into contiguous arrays of Slater coefficients, so that densities and
+    derivatives can be evaluated on any number of grids without recomputing shielding, normalization or exponents.
+    Build one with NewAtom.compile() (or AtomModel.fromAtom); shellTable() concatenates several into one table."""
+
+    def __init__(self, shellIndex, nStar, exponent, normalization, occupancy, slotCount, atomIndex=None):
+        self.shellIndex = numpy.ascontiguousarray(shellIndex, dtype=int)  # position of each shell in the occupancy list
+        self.nStar = numpy.ascontiguousarray(nStar, dtype=float)
+        self.power = self.nStar - 1  # power of r in the wavefunction
+        self.exponent = numpy.ascontiguousarray(exponent, dtype=float)  # (Z - s) / n*
+        self.normalization = numpy.ascontiguousarray(normalization, dtype=float)  # A
+        self.occupancy = numpy.ascontiguousarray(occupancy, dtype=float)  # N
+        self.densityScale = self.occupancy * self.normalization ** 2
+        self.slotCount = slotCount  # length of the occupancy list, occupied or not
+        if atomIndex is None:
+            atomIndex = numpy.zeros(len(self.nStar), dtype=int)
+        self.atomIndex = numpy.ascontiguousarray(atomIndex, dtype=int)  # owning atom of each shell in a combined table
+        self.coefficientCache = {}
+
+    @classmethod
+    def fromAtom(cls, atom):
+        """Compiles the occupied shells of a NewAtom object."""
+        with Instrumentation.span("Slater.normalization"):
+            occupancy = numpy.asarray(atom.occupancy, dtype=float)
+            shellIndex = numpy.flatnonzero(occupancy)
+            energyLevels = numpy.asarray(atom.principalQuantumNumberLabelList)[shellIndex]
+            nx = numpy.array([nStar[e] for e in energyLevels])
+            gammas = numpy.array([nStarGamma[e] for e in energyLevels])
+            charge = atom.atomicNumber - numpy.asarray(atom.shieldingValues, dtype=float)[shellIndex]
+            if numpy.any(charge < 0):
+                print("Fatal Error: UNBOUND ATOM")
+                print("Shielding charge {0} exceeds nuclear charge {1} ".format(atom.atomicNumber - charge.min(), atom.atomicNumber))
+                print("Results will likely be nonsensical!")
+            exponent = charge / nx
+            normalization = numpy.sqrt((2.0 * charge) ** (2.0 * nx + 1) / (4.0 * numpy.pi * nx ** (2.0 * nx + 1) * gammas))
+            occupancy = occupancy[shellIndex]
+        return cls(shellIndex, nx, exponent, normalization, occupancy, len(atom.occupancy))
+
+    @classmethod
+    def fromConfigurations(cls, atomicNumbers, occupancies):
+        """Compiles many configurations at once from their stacked occupancies, without building NewAtom objects. \n
+        atomicNumbers -- nuclear charge of each configuration \n
+        occupancies -- (configurations, shells) array with one zero padded occupancy list per row \n
+        Returns: one AtomModel holding the occupied shells of every row, whose atomIndex is the row number."""
+        with Instrumentation.span("Slater.normalization"):
+            occupancies = numpy.asarray(occupancies, dtype=float)
+            atomIndex, shellIndex = numpy.nonzero(occupancies)
+            energyLevels = Atoms.principalArray[shellIndex]
+            if numpy.any(energyLevels > max(nStar)):
+                raise KeyError("no effective quantum number n* for shells beyond n = " + str(max(nStar)))
+            nx = nStarTable[energyLevels]
+            gammas = nStarGammaTable[energyLevels]
+            charge = (numpy.asarray(atomicNumbers, dtype=float)[atomIndex]
+                      - Atoms.shieldingConstants(occupancies)[atomIndex, shellIndex])
+            if numpy.any(charge < 0):
+                print("Fatal Error: UNBOUND ATOM")
+                print("Shielding charge exceeds nuclear charge in " + str(len(numpy.unique(atomIndex[charge < 0]))) + " configurations")
+                print("Results will likely be nonsensical!")
+            exponent = charge / nx
+            normalization = numpy.sqrt((2.0 * charge) ** (2.0 * nx + 1) / (4.0 * numpy.pi * nx ** (2.0 * nx + 1) * gammas))
+        return cls(shellIndex, nx, exponent, normalization, occupancies[atomIndex, shellIndex], occupancies.shape[1], atomIndex)
+
+    @classmethod
+    def concatenate(cls, models):
+        """Stacks the shells of several models into one table, recording which model each shell came from."""
+        if len(models) == 1:
+            return models[0]
+        return cls(numpy.concatenate([m.shellIndex for m in models] + [numpy.zeros(0, dtype=int)]),
+                   numpy.concatenate([m.nStar for m in models] + [numpy.zeros(0)]),
+                   numpy.concatenate([m.exponent for m in models] + [numpy.zeros(0)]),
+                   numpy.concatenate([m.normalization for m in models] + [numpy.zeros(0)]),
+                   numpy.concatenate([m.occupancy for m in models] + [numpy.zeros(0)]),
+                   max([m.slotCount for m in models] + [0]),
+                   numpy.repeat(numpy.arange(len(models)), [len(m) for m in models]))
+
+    def __len__(self):
+        return len(self.nStar)
+
+    def __repr__(self):
+        return "AtomModel with " + str(len(self)) + " occupied shells"
+
+
+def toModel(atom):
+    """Returns the compiled AtomModel of a NewAtom object, passing AtomModel objects through unchanged."""
+    if isinstance(atom, AtomModel):
+        return atom
+    return atom.compile()
+
+
+def shellTable(atoms):
+    """Flattens the occupied shells of a list of atoms into a single table of shell parameters. \n
+    atoms -- list of NewAtom or AtomModel objects \n
+    Returns: an AtomModel holding every occupied shell, ordered by atom, whose atomIndex gives the position of the
+    owning atom in atoms."""
+    return AtomModel.concatenate([toModel(atom) for atom in atoms])
+
+
+def derivativeCoefficients(table, order):
+    """Coefficients of the order-th radial derivative of each shell density in a shell table. \n
+    Each shell density is the polynomial-times-exponential N A^2 r^p exp(-a r), with p = 2(n* - 1) and
+    a = 2(Z - s)/n*, so its kth derivative is the density times the polynomial in 1/r
+    sum_j C(k, j) (-a)^(k - j) p(p - 1)...(p - j + 1) r^(-j). The result is cached on the table. \n
+    Returns: a (shells, order + 1) array whose jth column multiplies r^(-j)."""
+    if order in table.coefficientCache:
+        return table.coefficientCache[order]
+    p = 2 * table.power
+    a = 2 * table.exponent
+    coefficients = numpy.empty((len(p), order + 1))
+    falling = numpy.ones(len(p))
+    for j in range(order + 1):
+        coefficients[:, j] = math.comb(order, j) * (-a) ** (order - j) * falling
+        falling = falling * (p - j)
+    table.coefficientCache[order] = coefficients
+    return coefficients
+
+
+# Derivative orders computed when the caller does not ask for specific ones: the density and its first four derivatives
+allOrders = (0, 1, 2, 3, 4)
+
+
+def checkOrders(orders):
+    """Returns the requested derivative orders as a tuple, rejecting an empty or negative request."""
+    orders = tuple(int(k) for k in orders)
+    if len(orders) == 0 or min(orders) < 0:
+        raise ValueError("Derivative orders must be a non-empty list of non-negative integers, not " + str(orders))
+    return orders
+
+
+class Workspace:
+    """Scratch and output buffers reused across calls to the density routines. Buffers are kept by name and
+    reallocated only when the requested shape changes, so repeated calls on the same grid with the same atoms
+    allocate nothing after the first. Results returned from a workspace are overwritten by the next call using it."""
+
+    def __init__(self):
+        self.buffers = {}
+        self.slabs = []  # one child workspace per thread, see onThreads
+
+    def slab(self, i):
+        """Returns the child workspace used by the ith thread of a threaded evaluation."""
+        while len(self.slabs) <= i:
+            self.slabs.append(Workspace())
+        return self.slabs[i]
+
+    def get(self, name, shape):
+        """Returns the buffer called name with the given shape, creating it if needed. Contents are undefined."""
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != shape:
+            buffer = numpy.empty(shape)
+            self.buffers[name] = buffer
+            Instrumentation.countBytes("Slater.Workspace", buffer.nbytes)
+        return buffer
+
+    def nbytes(self):
+        """Total size of the buffers held, in bytes."""
+        return sum(buffer.nbytes for buffer in self.buffers.values()) + sum(slab.nbytes() for slab in self.slabs)
+
+
+def onThreads(threads, arrayX, outputs, workspace, evaluate):
+    """Splits the grid into one contiguous slab per thread and evaluates the slabs on a thread pool. numpy releases
+    the GIL inside its elementwise kernels, so the slabs run concurrently. \n
+    threads -- number of threads \n
+    arrayX -- array of radial positions or GridStretch.GridContext \n
+    outputs -- preallocated arrays with the grid along their last axis; each thread writes only its own slice \n
+    workspace -- Workspace whose child workspaces the threads use \n
+    evaluate -- function(slabX, slabOutputs, slabWorkspace) that fills slabOutputs for the points slabX"""
+    arrayX = numpy.asarray(arrayX, dtype=float)
+    bounds = numpy.linspace(0, len(arrayX), threads + 1).astype(int)
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(evaluate, arrayX[bounds[i]:bounds[i + 1]],
+                               [output[..., bounds[i]:bounds[i + 1]] for output in outputs], workspace.slab(i))
+                   for i in range(threads) if bounds[i + 1] > bounds[i]]
+        for future in futures:
+            future.result()
+
+
+def inverseGrid(arrayX, workspace):
+    """Returns 1/r for a grid, shared from a GridStretch.GridContext or computed into the workspace."""
+    if isinstance(arrayX, GridStretch.GridContext):
+        return arrayX.inverseX
+    return numpy.divide(1, arrayX, out=workspace.get("inverseX", numpy.shape(arrayX)))
+
+
+def shellKernel(arrayX, table, orders=allOrders, out=None, workspace=None):
+    """Evaluates every shell of a shell table (see shellTable) in a single broadcast over a (shells x grid) array. \n
+    arrayX -- array of radial positions or GridStretch.GridContext \n
+    table -- AtomModel of the shells to evaluate \n
+    orders -- radial derivative orders to compute, in the order they should be returned; any order is allowed, and
+    each one needs only the density, so orders that are not asked for are never computed \n
+    out -- optional (shells, len(orders), len(arrayX)) array to write the result into \n
+    workspace -- optional Workspace supplying the result (when out is not given) and scratch buffers \n
+    Returns: a (shells, len(orders), len(arrayX)) array holding the requested derivatives of each shell density."""
+    if workspace is None:
+        workspace = Workspace()
+    grid = arrayX
+    arrayX = numpy.asarray(arrayX, dtype=float)
+    orders = checkOrders(orders)
+    shape = (len(table), len(orders), len(arrayX))
+    Instrumentation.count("shells evaluated", len(table))
+    Instrumentation.count("shell-points evaluated", len(table) * len(arrayX))
+    shells = workspace.get("shells", shape) if out is None else out
+    if 0 in orders:
+        density = shells[:, orders.index(0)]
+    else:
+        density = workspace.get("density", shape[::2])
+    with Instrumentation.span("Slater.exponentials"):
+        scratch = workspace.get("scratch", shape[::2])
+        numpy.multiply(-2 * table.exponent[:, None], arrayX, out=scratch)
+        if isinstance(grid, GridStretch.GridContext) and grid.positive:
+            # r^p exp(-a r) = exp(p log r - a r): one exponential and no power, using the grid's cached log r.
+            numpy.multiply(2 * table.power[:, None], grid.logX, out=density)
+            density += scratch
+            numpy.exp(density, out=density)
+        else:
+            numpy.power(arrayX, 2 * table.power[:, None], out=density)
+            numpy.exp(scratch, out=scratch)
+            density *= scratch
+        density *= table.densityScale[:, None]
+    with Instrumentation.span("Slater.derivatives"):
+        if max(orders) > 0:
+            inverseX = inverseGrid(grid, workspace)
+        for position in range(len(orders)):
+            k = orders[position]
+            if k == 0:
+                continue
+            # Horner's rule on the polynomial in 1/r, then one multiplication by the density.
+            coefficients = derivativeCoefficients(table, k)
+            derivative = shells[:, position]
+            derivative[...] = coefficients[:, k, None]
+            for j in range(k - 1, -1, -1):
+                derivative *= inverseX
+                derivative += coefficients[:, j, None]
+            derivative *= density
+    return shells
+
+
+def densityKernel(arrayX, atom, orders=allOrders, out=None, workspace=None, threads=1):
+    """Evaluates every occupied shell of the atom in a single broadcast over a (shells x grid) array. \n
+    arrayX -- array of radial positions or GridStretch.GridContext \n
+    atom -- NewAtom or AtomModel object \n
+    orders -- radial derivative orders to compute (see shellKernel) \n
+    out -- optional (total, components) pair of arrays, shaped as below, to write the result into \n
+    workspace -- optional Workspace supplying the result (when out is not given) and scratch buffers \n
+    threads -- number of threads to split the grid between (see onThreads) \n
+    Returns: the requested derivatives of the total density as a (len(orders), len(arrayX)) array, and of each shell
+    density as a (len(atom.occupancy), len(orders), len(arrayX)) array. Shells with zero occupancy are never
+    evaluated and are left as zeros."""
+    if workspace is None:
+        workspace = Workspace()
+    table = toModel(atom)
+    if threads > 1:
+        orders = checkOrders(orders)
+        if out is None:
+            out = (workspace.get("total", (len(orders), len(arrayX))),
+                   workspace.get("components", (table.slotCount, len(orders), len(arrayX))))
+        onThreads(threads, arrayX, out, workspace,
+                  lambda slabX, slabOut, slabWorkspace: densityKernel(slabX, table, orders, slabOut, slabWorkspace))
+        return out
+    shells = shellKernel(arrayX, table, orders, workspace=workspace)
+    if out is None:
+        out = (workspace.get("total", shells.shape[1:]), workspace.get("components", (table.slotCount,) + shells.shape[1:]))
+    total, components = out
+    components[...] = 0
+    components[table.shellIndex] = shells
+    shells.sum(axis=0, out=total)
+    return total, components
+
+
+def totalDensity(arrayX, atom, orders=allOrders, out=None, workspace=None, threads=1):
+    """Evaluates only the total density of the atom and its requested derivatives, without keeping the shells. \n
+    arrayX -- array of radial positions or GridStretch.GridContext \n
+    atom -- NewAtom or AtomModel object \n
+    orders -- radial derivative orders to compute (see shellKernel) \n
+    out -- optional (len(orders), len(arrayX)) array to write the result into \n
+    workspace -- optional Workspace supplying the result (when out is not given) and scratch buffers \n
+    threads -- number of threads to split the grid between (see onThreads) \n
+    Returns: a (len(orders), len(arrayX)) array."""
+    if workspace is None:
+        workspace = Workspace()
+    if threads > 1:
+        orders = checkOrders(orders)
+        model = toModel(atom)
+        if out is None:
+            out = workspace.get("total", (len(orders), len(arrayX)))
+        onThreads(threads, arrayX, [out], workspace,
+                  lambda slabX, slabOut, slabWorkspace: totalDensity(slabX, model, orders, slabOut[0], slabWorkspace))
+        return out
+    shells = shellKernel(arrayX, toModel(atom), orders, workspace=workspace)
+    if out is None:
+        out = workspace.get("total", shells.shape[1:])
+    return shells.sum(axis=0, out=out)
+
+
+def batchDensity(arrayX, atoms, orders=allOrders, out=None, workspace=None, threads=1):
+    """Evaluates the total densities of many atoms on one shared grid, with all of their shells in a single table. \n
+    arrayX -- array of radial positions or GridStretch.GridContext \n
+    atoms -- list of NewAtom or AtomModel objects, (atomicNumber, occupancy) pairs or element names from
+    Atoms.atomData \n
+    orders -- radial derivative orders to compute (see shellKernel) \n
+    out -- optional (atoms, len(orders), len(arrayX)) array to write the result into \n
+    workspace -- optional Workspace supplying the result (when out is not given) and scratch buffers \n
+    threads -- number of threads to split the grid between (see onThreads) \n
+    Returns: an (atoms, len(orders), len(arrayX)) array of the requested derivatives of each atom's total density."""
+    Instrumentation.count("calls: Slater.batchDensity")
+    atoms = [toAtom(atom) for atom in atoms]
+    return tableDensity(arrayX, shellTable(atoms), len(atoms), orders, out=out, workspace=workspace, threads=threads)
+
+
+def tableDensity(arrayX, table, atomCount, orders=allOrders, out=None, workspace=None, threads=1):
+    """Evaluates the total density of every atom in a combined shell table, e.g. one from shellTable or
+    AtomModel.fromConfigurations. \n
+    table -- AtomModel whose atomIndex gives the owning atom of each shell \n
+    atomCount -- number of atoms; atoms without any shells in the table get a density of zero \n
+    The other arguments and the result are as for batchDensity."""
+    if workspace is None:
+        workspace = Workspace()
+    if threads > 1:
+        orders = checkOrders(orders)
+        if out is None:
+            out = workspace.get("totals", (atomCount, len(orders), len(arrayX)))
+        onThreads(threads, arrayX, [out], workspace,
+                  lambda slabX, slabOut, slabWorkspace: tableDensity(slabX, table, atomCount, orders, slabOut[0], slabWorkspace))
+        return out
+    shells = shellKernel(arrayX, table, orders, workspace=workspace)
+    if out is None:
+        out = workspace.get("totals", (atomCount,) + shells.shape[1:])
+    present, starts = numpy.unique(table.atomIndex, return_index=True)
+    if len(present) == atomCount:
+        numpy.add.reduceat(shells, starts, axis=0, out=out)
+    else:
+        out[...] = 0
+        if len(present) > 0:
+            out[present] = numpy.add.reduceat(shells, starts, axis=0)
+    return out
+
+
+def radialIntegrals(atoms, function=None, count=32):
+    """Integrates function(r) 4 pi r^2 rho(r) over all space for each of many atoms by Gauss-Laguerre quadrature,
+    evaluating every shell only at count nodes scaled to its own exponent (see Quadrature.shellIntegrals). \n
+    atoms -- list of anything batchDensity accepts \n
+    function -- vectorized function of r, e.g. lambda r: r for the mean radius; None gives the electron count \n
+    count -- nodes per shell; 32 integrate the densities themselves to about 1e-12 \n
+    Returns: an array with one integral per atom"""
+    atoms = [toAtom(atom) for atom in atoms]
+    return Quadrature.atomIntegrals(shellTable(atoms), len(atoms), function, count)
+
+
+def toAtom(atom):
+    """Turns an element name from Atoms.atomData or an (atomicNumber, occupancy) pair into the shared atom interned
+    by Atoms.defaultFactory. NewAtom and AtomModel objects are passed through unchanged."""
+    if isinstance(atom, str):
+        return Atoms.defaultFactory.element(atom)
+    if isinstance(atom, tuple):
+        atomicNumber, occupancy = atom
+        return Atoms.defaultFactory.get(atomicNumber, occupancy)
+    return atom
+
+
+def newDensity(arrayX, atom, orders=allOrders, out=None, workspace=None, threads=1):
     """gets total density and its derivatives, summing over shells \n
-    arrayX -- array of radial positions \n
-    listN  -- list of shell occupancy numbers \n
-    netCharge -- net charge"""
-    shieldingValues = atom.shieldingValues
-    netCharge = atom.atomicNumber
-    listN = atom.occupancy
-    length = len(arrayX)
-    final = numpy.zeros(length)
-    finalP1 = numpy.zeros(length)
-    finalP2 = numpy.zeros(length)
-    finalP3 = numpy.zeros(length)
-    finalP4 = numpy.zeros(length)
-    componentList = []
-    for j in range(len(listN)):
-        shieldingConstant = shieldingValues[j]
-        e = atom.principalQuantumNumberLabelList[j]
-        N = listN[j]
-        dens, densP1, densP2, densP3, densP4 = n(shieldingConstant, e, netCharge, arrayX, N)
-        final = final + dens
-        finalP1 = finalP1 + densP1
-        finalP2 = finalP2 + densP2
-        finalP3 = finalP3 + densP3
-        finalP4 = finalP4 + densP4
-        densDerivativeList = [dens, densP1, densP2, densP3, densP4]
-        componentList.append(densDerivativeList)
-    finalDerivativeList = [final, finalP1, finalP2, finalP3, finalP4]
-    return finalDerivativeList, componentList
-
-
-def grlaglll(arrayX, atom):  # commented out until I adapt it to work with the newAtom object.
-    """Returns the RADIAL density and its gradient, laplacian, grad(lapl), lapl(lapl)\n
-    arrayX -- array of radial positions \n
-    listN  -- list of shell occupancy numbers \n
-    netCharge      -- net charge"""
-    N = len(arrayX)
+    arrayX -- array of radial positions or GridStretch.GridContext \n
+    atom -- NewAtom object \n
+    orders -- derivative orders to compute, e.g. [0] for the density alone; by default the density and four
+    derivatives \n
+    out, workspace -- optional caller-owned output arrays or Workspace (see densityKernel) \n
+    threads -- number of threads to split the grid between, for a single large evaluation \n
+    Returns: total density and the requested derivatives, and a list of the same for each shell (see densityKernel)"""
+    Instrumentation.count("calls: Slater.newDensity")
+    return densityKernel(arrayX, atom, orders, out=out, workspace=workspace, threads=threads)
+
 
-    # print("grlaglll: listN", listN)
-    d0, d1, d2, d3, d4 = newDensity(arrayX, atom,)[0]
+def streamDensity(grid, atom, orders=allOrders, components=False, chunkSize=65536, workspace=None):
+    """Evaluates the density of the atom one block of grid points at a time, so memory stays bounded by the chunk size
+    however many points there are. \n
+    grid -- an array or GridStretch.GridContext (split into chunks of chunkSize points), a dictionary of
+    GridStretch.gridChunks arguments describing a grid that is never built in full, or any iterable of arrays of
+    radial positions (for instance the distances of scattered 3D sample points, a block at a time) \n
+    atom -- NewAtom or AtomModel object \n
+    orders -- radial derivative orders to compute (see shellKernel) \n
+    components -- when True, the density and derivatives of each shell are produced as well \n
+    chunkSize -- number of points per block when the grid is split here \n
+    workspace -- optional Workspace reused for every block \n
+    Yields: (chunkX, total) for each block, or (chunkX, total, components) when components is True, shaped as in
+    densityKernel. The yielded arrays are reused for the next block, so copy anything that must be kept."""
+    if workspace is None:
+        workspace = Workspace()
+    if isinstance(grid, dict):
+        chunks = GridStretch.gridChunks(chunkSize=chunkSize, **grid)
+    elif isinstance(grid, (numpy.ndarray, GridStretch.GridContext)):
+        arrayX = numpy.asarray(grid, dtype=float)
+        chunks = (arrayX[i:i + chunkSize] for i in range(0, len(arrayX), chunkSize))
+    else:
+        chunks = grid
+    model = toModel(atom)
+    for chunkX in chunks:
+        if components:
+            total, shellDensities = densityKernel(chunkX, model, orders, workspace=workspace)
+            yield chunkX, total, shellDensities
+        else:
+            yield chunkX, totalDensity(chunkX, model, orders, workspace=workspace)
+
+
+# The quantities grlaglll can return, and the derivative orders of the density each one is built from
+grlaglllQuantities = ("density", "grad", "lapl", "glap", "llap")
+grlaglllOrders = {"density": (0,), "grad": (1,), "lapl": (1, 2), "glap": (1, 2, 3), "llap": (3, 4)}
+
+
+def grlaglll(arrayX, atom, quantities=grlaglllQuantities, out=None, workspace=None, threads=1):
+    """Returns the RADIAL density and its gradient, laplacian, grad(lapl), lapl(lapl)\n
+    arrayX -- array of radial positions or GridStretch.GridContext \n
+    atom -- NewAtom object \n
+    quantities -- names from grlaglllQuantities to return, e.g. ["lapl"]; only the derivatives they need are computed \n
+    out -- optional (len(quantities), len(arrayX)) array to write the results into \n
+    workspace -- optional Workspace supplying the result (when out is not given) and scratch buffers \n
+    threads -- number of threads to split the grid between (see onThreads)"""
+    Instrumentation.count("calls: Slater.grlaglll")
+    quantities = tuple(quantities)
+    for quantity in quantities:
+        if quantity not in grlaglllOrders:
+            raise ValueError("Unknown grlaglll quantity '" + str(quantity) + "', expected one of " + str(grlaglllQuantities))
+    orders = tuple(sorted(set(k for quantity in quantities for k in grlaglllOrders[quantity])))
+    if workspace is None:
+        workspace = Workspace()
+    if out is None:
+        out = workspace.get("grlaglll", (len(quantities), len(arrayX)))
+    if threads > 1:
+        model = toModel(atom)
+        onThreads(threads, arrayX, [out], workspace,
+                  lambda slabX, slabOut, slabWorkspace: grlaglll(slabX, model, quantities, slabOut[0], slabWorkspace))
+        return tuple(out)
+    d = dict(zip(orders, totalDensity(arrayX, atom, orders, workspace=workspace)))
+    if max(orders) > 0:
+        inverseX = inverseGrid(arrayX, workspace)
 
-    grad = d1
-    lapl = d2 + 2 * d1 / arrayX
-    glap = d3 + 2 * d2 / arrayX - 2 * d1 / arrayX ** 2
-    llap = d4 + 4 * d3 / arrayX
+    for result, quantity in zip(out, quantities):
+        if quantity == "density":
+            result[...] = d[0]
+        elif quantity == "grad":
+            result[...] = d[1]
+        elif quantity == "lapl":
+            # lapl = d2 + 2 * d1 / arrayX
+            numpy.multiply(d[1], inverseX, out=result)
+            result *= 2
+            result += d[2]
+        elif quantity == "glap":
+            # glap = d3 + 2 * d2 / arrayX - 2 * d1 / arrayX ** 2
+            numpy.multiply(d[1], inverseX, out=result)
+            numpy.subtract(d[2], result, out=result)
+            result *= inverseX
+            result *= 2
+            result += d[3]
+        elif quantity == "llap":
+            # llap = d4 + 4 * d3 / arrayX
+            numpy.multiply(d[3], inverseX, out=result)
+            result *= 4
+            result += d[4]
 
-    return d0, grad, lapl, glap, llap
+    return tuple(out)
 
 
 # The following are some miscellaneous analytic density routines.
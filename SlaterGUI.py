@@ -2,11 +2,11 @@
    By Neal Coleman
    Modified and expanded by Daniel Isenberg
 """
-import Slater
 import inputFunctions
-import numpy
 import matplotlib.pyplot as plt
 import Atoms
+import GridStretch
+import DensityCache
 
 # need to do: add documentation about how to use stuff and what it means
 run = True
@@ -19,43 +19,42 @@ while run:
         atomicNumber = inputFunctions.getAtomicNumber()
         electronOccupancy = inputFunctions.getElectronConfigInput()
         elementName = "placeholder element name"
-        atom = Atoms.NewAtom(atomicNumber, elementName, electronOccupancy)
+        atom = Atoms.defaultFactory.get(atomicNumber, electronOccupancy, elementName)
     else:
         elementName = target
-        atomicNumber = Atoms.atomData[target]['atomicNumber']
-        electronOccupancy = Atoms.atomData[target]['occupancy']
-        atom = Atoms.NewAtom(atomicNumber, elementName, electronOccupancy)
+        atom = Atoms.defaultFactory.element(target)  # shared with every earlier request for the same element
+        atomicNumber = atom.atomicNumber
 
     plotType = inputFunctions.getPlotType()
     derivativeNumber = inputFunctions.chooseDerivativeOptions()
     scaleType = inputFunctions.getScaleType()
     arrayX = inputFunctions.getArrayX(scaleType)
+    grid = GridStretch.GridContext(arrayX)  # shares 1/r, 4 pi r^2, etc. between the density routines and the plots below
     inputFunctions.showEnergy(atom.totalEnergy)
 
     if function == "density":
         if target == "manual":
-            dty, components = Slater.newDensity(arrayX, atom)
+            dty, components = DensityCache.defaultCache.newDensity(grid, atom, orders=[derivativeNumber])  # only the plotted derivative is computed, so it is entry 0 below
         else:
-            dty, components = Slater.newDensity(arrayX, atom)
+            dty, components = DensityCache.defaultCache.newDensity(grid, atom, orders=[derivativeNumber])  # only the plotted derivative is computed, so it is entry 0 below
     if function == "grlaglll":
         if target == "manual":
             print("Run manual mode on grlaglll")
         else:
             print("run grlaglll in auto mode")
 
-    dty = 4 * numpy.pi * arrayX ** 2 * dty
+    dty = grid.shellVolume * dty
     yList = []
     yListMaster = []
 
     if plotType == "cumulative" or plotType == "both":  # Plots the combined density of every shell in the system as a single data set, without showing the contributions of each shell individual .
         for i in range(len(arrayX)):
-            yList.append(dty[derivativeNumber][i])
+            yList.append(dty[0][i])
         yListMaster.append(yList)
 
     if plotType == "components" or plotType == "both":  # Plots the contribution to the density from each individual shell as its own data set.
         for index in range(len(components)):
-            components[index][derivativeNumber] = 4 * numpy.pi * arrayX ** 2 * components[index][derivativeNumber]
-            yListMaster.append(components[index][derivativeNumber])
+            yListMaster.append(grid.shellVolume * components[index][0])  # cached results are read-only, so scale a copy
 
     for i in range(len(yListMaster)):  # This loop adds the desired plots to the output graph, and ensures they have the appropriate label in the legend.
         emptyOrbitalFlag = True
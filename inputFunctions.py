@@ -135,8 +135,4 @@ def getElectronConfigFromJson(orbitalConfigString):
 def getArrayXFromJSON(scaleType, listLength):
     """Takes a string value for scaleType and an integer extracted from a JSON file for the length of the x axis.\n
         Returns arrayX, appropriately scaled to either an exponential or uniform scale factor."""
-    if scaleType == "Exponential":
-        arrayX = GridStretch.ExpGridStretch2(numpy.arange(0.01, 1.0 * listLength, 0.01))
-    else:
-        arrayX = numpy.arange(0.01, 1.0 * listLength, 0.01)
-    return arrayX
+    return GridStretch.radialGrid(scaleType, listLength)